@@ -0,0 +1,53 @@
+"""Optional Numba kernel for scoring large indexes.
+
+Numba is not a hard dependency and the kernel is off by default (enable it
+with ``NUMBA_SCORING``): on small machines it is no faster than NumPy's BLAS
+``dot``. Without it, for small matrices, or when no thread-safe threading
+layer is available, scoring stays on NumPy.
+"""
+import numpy as np
+
+try:
+    import numba
+except ImportError:  # numba 可选：缺失时走 NumPy
+    numba = None
+
+# 行数低于该值时并行内核的调度开销大于收益
+NUMBA_MIN_ROWS = 10000
+
+# 内核是否可用；首次调用时找不到线程安全的线程层则置为 False
+_KERNEL_STATE = {"usable": numba is not None}
+
+if numba is not None:
+    # FastAPI 在线程池里并发处理请求：只允许 tbb/omp 这类可重入的线程层，
+    # workqueue 层遇到并发进入并行内核会直接终止进程
+    numba.config.THREADING_LAYER = "threadsafe"
+
+    @numba.njit(parallel=True, fastmath=True, cache=True)
+    def _dot_rows_kernel(matrix, query, out):
+        for i in numba.prange(matrix.shape[0]):
+            total = np.float32(0.0)
+            for j in range(matrix.shape[1]):
+                total += matrix[i, j] * query[j]
+            out[i] = total
+
+
+def dot_rows(matrix: np.ndarray, query: np.ndarray, use_numba: bool = False) -> np.ndarray:
+    """Return ``matrix @ query`` for a float32 matrix and query vector."""
+    if (
+        not use_numba
+        or not _KERNEL_STATE["usable"]
+        or matrix.shape[0] < NUMBA_MIN_ROWS
+        or matrix.dtype != np.float32
+    ):
+        return matrix.dot(query)
+
+    out = np.empty(matrix.shape[0], dtype=np.float32)
+    try:
+        # memmap 是 ndarray 子类，转成普通视图（不复制）再交给 numba
+        _dot_rows_kernel(np.asarray(matrix), np.ascontiguousarray(query, dtype=np.float32), out)
+    except ValueError:
+        # 没有安装 tbb/omp：不能安全并发，之后都走 NumPy
+        _KERNEL_STATE["usable"] = False
+        return matrix.dot(query)
+    return out
@@ -1,5 +1,10 @@
 from langdetect import LangDetectException, detect
 
+try:
+    import cld3  # pycld3：C++ 实现，短文本上比 langdetect 快且更准
+except ImportError:
+    cld3 = None
+
 
 LANG_NAME_MAP = {
     "en": "English",
@@ -35,9 +40,23 @@ def normalize_lang(lang_code: str | None) -> str:
 
 
 def detect_lang(text: str) -> str:
-    """Detect language code from text; fallback to English on failure."""
+    """Detect language code from text; fallback to English on failure.
+
+    Uses cld3 when installed and langdetect otherwise. Very short ASCII
+    input carries no usable signal and is treated as English directly.
+    """
+    text = (text or "").strip()
+    if len(text) < 4 and text.isascii():
+        return "en"
+
+    if cld3 is not None:
+        prediction = cld3.get_language(text)
+        if prediction is None or prediction.language == "und":
+            return "en"
+        return normalize_lang(prediction.language)
+
     try:
-        code = detect(text or "")
+        code = detect(text)
     except LangDetectException:
         return "en"
 
@@ -1,24 +1,74 @@
 import json
+import os
 import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Dict, List, Tuple
 
 import numpy as np
 import requests
+from requests.adapters import HTTPAdapter
 
+try:
+    import msgpack
+except ImportError:  # msgpack 可选：缺失时只读写 meta.json
+    msgpack = None
+
+from app._simd import dot_rows
 from app.config import load_config
 
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
 COMPANIES_DIR = PROJECT_ROOT / "companies"
+CONFIG_PATH = PROJECT_ROOT / "config.json"
+
+CONFIG_CACHE: Dict = {
+    "mtime": None,
+    "config": None,
+}
+
+# 每次批量向量化的文本条数，过大容易触发 Ollama 的 context length 错误
+EMBED_BATCH_SIZE = 64
+# 同时在途的向量化请求数，不超过连接池大小
+EMBED_CONCURRENCY = 8
+
+_PAGE_HEADING_RE = re.compile(r"(?:页面|page)\s*(\d+)", re.IGNORECASE)
+
+# 进程内索引缓存：company -> (文件 mtime, 索引)，按 LRU 淘汰
+INDEX_CACHE_MAX = 16
+_INDEX_CACHE: "OrderedDict[str, Tuple[Tuple[float, float], Dict]]" = OrderedDict()
+# 请求在线程池里并发执行：查找/插入/淘汰需要互斥，否则并发淘汰会让 move_to_end 抛 KeyError
+_INDEX_CACHE_LOCK = threading.Lock()
+
+# 不支持批量 /api/embed 的 Ollama 地址（旧版本）；探测一次后直接走 /api/embeddings
+_EMBED_BATCH_UNSUPPORTED: set = set()
+
+_SESSION = requests.Session()
+_SESSION.mount("http://", HTTPAdapter(pool_connections=32, pool_maxsize=32))
+_SESSION.mount("https://", HTTPAdapter(pool_connections=32, pool_maxsize=32))
+
+
+def get_config() -> Dict:
+    """Return load_config(), re-reading only when config.json changes."""
+    try:
+        mtime = CONFIG_PATH.stat().st_mtime
+    except OSError:
+        mtime = None
+
+    if CONFIG_CACHE["config"] is None or CONFIG_CACHE["mtime"] != mtime:
+        CONFIG_CACHE["config"] = load_config()
+        CONFIG_CACHE["mtime"] = mtime
+    return CONFIG_CACHE["config"]
 
 
 def get_base_url(config: Dict | None = None) -> str:
-    cfg = config or load_config()
+    cfg = config or get_config()
     return str(cfg.get("OLLAMA_BASE_URL", "")).rstrip("/")
 
 
 def get_embed_model(config: Dict | None = None) -> str:
-    cfg = config or load_config()
+    cfg = config or get_config()
     return str(cfg.get("EMBED_MODEL", ""))
 
 
@@ -46,13 +96,8 @@ def load_sources_meta(company: str) -> Dict:
 
 
 def _parse_page_id(heading: str) -> int | None:
-    match = re.search(r"(页面|page)\s*(\d+)", heading, re.IGNORECASE)
-    if not match:
-        return None
-    try:
-        return int(match.group(2))
-    except ValueError:
-        return None
+    match = _PAGE_HEADING_RE.search(heading)
+    return int(match.group(1)) if match else None
 
 
 def split_sources_by_page(text: str) -> List[Tuple[int | None, str]]:
@@ -65,14 +110,14 @@ def split_sources_by_page(text: str) -> List[Tuple[int | None, str]]:
             page_id = _parse_page_id(line)
             if page_id is not None:
                 if buffer:
-                    sections.append((current_id, "\n".join(buffer).strip()))
+                    sections.append((current_id, "".join(buffer).strip()))
                     buffer = []
                 current_id = page_id
                 continue
-        buffer.append(line)
+        buffer.append(line + "\n")
 
     if buffer:
-        sections.append((current_id, "\n".join(buffer).strip()))
+        sections.append((current_id, "".join(buffer).strip()))
 
     if not sections:
         sections = [(None, text.strip())]
@@ -91,7 +136,7 @@ def chunk_text(
     """
 
     if max_chars is None or overlap is None:
-        config = load_config()
+        config = get_config()
         if max_chars is None:
             max_chars = int(config.get("CHUNK_SIZE", 200))
         if overlap is None:
@@ -109,27 +154,32 @@ def chunk_text(
             chunks.append(para)
             continue
 
-        start = 0
-        while start < len(para):
-            end = min(start + max_chars, len(para))
-            piece = para[start:end].strip()
+        # 窗口起点按固定步长推进；最后一个窗口覆盖到段尾即停止
+        step = max(1, max_chars - overlap)
+        last_start = max(len(para) - overlap, 1)
+        for start in range(0, last_start, step):
+            piece = para[start : start + max_chars].strip()
             if piece:
                 chunks.append(piece)
-            if end >= len(para):
-                break
-            start = max(0, end - overlap)
 
     return chunks
 
 
+class _EndpointNotFound(RuntimeError):
+    """The Ollama server does not provide the requested API endpoint."""
+
+
 def _post_json(url: str, payload: Dict, timeout: int = 60) -> Dict:
     try:
-        response = requests.post(url, json=payload, timeout=timeout)
+        response = _SESSION.post(url, json=payload, timeout=timeout)
     except requests.RequestException as exc:
         raise RuntimeError(f"无法连接 Ollama: {exc}") from exc
 
     if response.status_code != 200:
         message = f"Ollama 接口错误 {response.status_code}: {response.text}"
+        # 旧版本没有该路由时返回纯文本 404（模型不存在的 404 带 JSON error 字段）
+        if response.status_code in (404, 405) and "model" not in response.text.lower():
+            raise _EndpointNotFound(message)
         if "context length" in response.text:
             message += "。可尝试调小 config.json 或环境变量里的 CHUNK_SIZE"
         raise RuntimeError(message)
@@ -140,45 +190,129 @@ def _post_json(url: str, payload: Dict, timeout: int = 60) -> Dict:
         raise RuntimeError("Ollama 返回的 JSON 无法解析") from exc
 
 
+def _embed_one(text: str, base_url: str, model: str) -> List[float]:
+    data = _post_json(
+        f"{base_url}/api/embeddings",
+        {"model": model, "prompt": text},
+        timeout=120,
+    )
+    if "embedding" not in data:
+        raise RuntimeError("Ollama embeddings 返回缺少 embedding 字段")
+    return data["embedding"]
+
+
+def _embed_batch(texts: List[str], base_url: str, model: str) -> List[List[float]]:
+    data = _post_json(
+        f"{base_url}/api/embed",
+        {"model": model, "input": texts},
+        timeout=120,
+    )
+    embeddings = data.get("embeddings")
+    if not isinstance(embeddings, list) or len(embeddings) != len(texts):
+        raise RuntimeError("Ollama embed 返回的 embeddings 数量不匹配")
+    return embeddings
+
+
+def _map_concurrent(func, items: List) -> List:
+    """Ordered map over items with up to EMBED_CONCURRENCY requests in flight."""
+    if len(items) <= 1:
+        return [func(item) for item in items]
+    with ThreadPoolExecutor(max_workers=min(EMBED_CONCURRENCY, len(items))) as pool:
+        return list(pool.map(func, items))
+
+
 def embed_texts(texts: List[str], base_url: str, model: str) -> np.ndarray:
+    """Embed texts via Ollama, batching through /api/embed when available.
+
+    Batches (or single prompts) are sent concurrently over the pooled session.
+    Older Ollama versions only expose the single-prompt /api/embeddings
+    endpoint; when /api/embed is missing (404) we remember that for the
+    server and send one request per text from then on. Other errors
+    (timeouts, connection failures) are raised as-is.
+    """
     if not texts:
         raise ValueError("没有可用于向量化的文本")
 
-    embeddings: List[List[float]] = []
-    for text in texts:
-        data = _post_json(
-            f"{base_url}/api/embeddings",
-            {"model": model, "prompt": text},
-            timeout=120,
+    batches = [
+        texts[start : start + EMBED_BATCH_SIZE]
+        for start in range(0, len(texts), EMBED_BATCH_SIZE)
+    ]
+    embeddings = None
+    if base_url not in _EMBED_BATCH_UNSUPPORTED:
+        try:
+            results = _map_concurrent(
+                lambda batch: _embed_batch(batch, base_url, model), batches
+            )
+            embeddings = [vector for batch in results for vector in batch]
+        except _EndpointNotFound:
+            _EMBED_BATCH_UNSUPPORTED.add(base_url)
+    if embeddings is None:
+        embeddings = _map_concurrent(
+            lambda text: _embed_one(text, base_url, model), texts
         )
-        if "embedding" not in data:
-            raise RuntimeError("Ollama embeddings 返回缺少 embedding 字段")
-        embeddings.append(data["embedding"])
 
     return np.array(embeddings, dtype=np.float32)
 
 
+def quantize_rows(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Quantize rows to int8 with a per-row float32 scale (row ≈ q * scale)."""
+    scales = np.max(np.abs(vectors), axis=1) / 127.0
+    scales[scales == 0] = 1
+    q_vectors = np.round(vectors / scales[:, None]).astype(np.int8)
+    return np.ascontiguousarray(q_vectors), scales.astype(np.float32)
+
+
+def _save_npy(path: Path, array: np.ndarray) -> None:
+    # 先写临时文件再原子替换：服务端以 mmap 方式读取，原地截断会让读取方崩溃
+    tmp_path = path.with_name(path.name + ".tmp")
+    with tmp_path.open("wb") as f:
+        np.save(f, array)
+    os.replace(tmp_path, path)
+
+
+def _write_bytes_atomic(path: Path, data: bytes) -> None:
+    # 与 _save_npy 相同：写一半中断时不会留下与向量不匹配的截断文件
+    tmp_path = path.with_name(path.name + ".tmp")
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, path)
+
+
 def save_index(
-    company: str, chunks: List[Dict], vectors: np.ndarray, model: str
+    company: str,
+    chunks: List[Dict],
+    vectors: np.ndarray,
+    model: str,
+    quantize: bool = False,
 ) -> None:
     company_dir = get_company_dir(company)
     rag_dir = company_dir / "rag"
     rag_dir.mkdir(parents=True, exist_ok=True)
 
     ids = [chunk["chunk_id"] for chunk in chunks]
-    texts = [chunk["text"] for chunk in chunks]
 
-    np.save(rag_dir / "vectors.npy", vectors)
+    vectors = normalize_rows(vectors)
+    _save_npy(rag_dir / "vectors.npy", vectors)
+    if quantize:
+        q_vectors, scales = quantize_rows(vectors)
+        _save_npy(rag_dir / "vectors_q8.npy", q_vectors)
+        _save_npy(rag_dir / "scales.npy", scales)
     meta = {
         "company": company,
         "embed_model": model,
+        "normalized": True,
+        "quantization": "int8" if quantize else "",
         "ids": ids,
-        "texts": texts,
         "chunks": chunks,
     }
-    (rag_dir / "meta.json").write_text(
-        json.dumps(meta, ensure_ascii=False, indent=2),
-        encoding="utf-8",
+    # meta.msgpack 供加载使用（免去 JSON 字符串转义解析），meta.json 保留为可读版本
+    msgpack_path = rag_dir / "meta.msgpack"
+    if msgpack is not None:
+        _write_bytes_atomic(msgpack_path, msgpack.packb(meta, use_bin_type=True))
+    elif msgpack_path.exists():
+        msgpack_path.unlink()
+    _write_bytes_atomic(
+        rag_dir / "meta.json",
+        json.dumps(meta, ensure_ascii=False, indent=2).encode("utf-8"),
     )
 
 
@@ -192,52 +326,140 @@ def load_index(company: str) -> Dict:
             f"找不到索引文件: {rag_dir}. 请先运行 python tools/build_index.py {company}"
         )
 
-    vectors = np.load(vectors_path)
-    meta = json.loads(meta_path.read_text(encoding="utf-8"))
-
-    return {
+    mtime = (vectors_path.stat().st_mtime, meta_path.stat().st_mtime)
+    with _INDEX_CACHE_LOCK:
+        cached = _INDEX_CACHE.get(company)
+        if cached and cached[0] == mtime:
+            _INDEX_CACHE.move_to_end(company)
+            return cached[1]
+
+    msgpack_path = rag_dir / "meta.msgpack"
+    if msgpack is not None and msgpack_path.exists():
+        meta = msgpack.unpackb(msgpack_path.read_bytes(), raw=False)
+    else:
+        meta = json.loads(meta_path.read_text(encoding="utf-8"))
+    scales = None
+    if meta.get("quantization") == "int8" and (rag_dir / "scales.npy").exists():
+        # int8 索引：矩阵体积约为 float32 的 1/4，检索时按行缩放还原
+        vectors = np.load(rag_dir / "vectors_q8.npy", mmap_mode="r")
+        scales = np.load(rag_dir / "scales.npy")
+    else:
+        vectors = np.load(vectors_path, mmap_mode="r")
+        if not meta.get("normalized"):
+            # 旧索引未做行归一化：加载时补做，检索阶段统一按点积计算
+            vectors = normalize_rows(vectors)
+
+    index = {
+        "version": mtime,
         "vectors": vectors,
+        "scales": scales,
         "ids": meta.get("ids", []),
+        # 旧版 meta.json 在顶层重复存了一份 texts，新索引只保留在 chunks 里
         "texts": meta.get("texts", []),
         "chunks": meta.get("chunks", []),
         "embed_model": meta.get("embed_model", ""),
     }
+    with _INDEX_CACHE_LOCK:
+        _INDEX_CACHE[company] = (mtime, index)
+        _INDEX_CACHE.move_to_end(company)
+        while len(_INDEX_CACHE) > INDEX_CACHE_MAX:
+            _INDEX_CACHE.popitem(last=False)
+    return index
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """Scale each row to unit L2 norm; all-zero rows are left as zeros.
+
+    The result is C-contiguous float32 so scoring stays on the BLAS SGEMV path.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.sqrt(np.einsum("ij,ij->i", vectors, vectors))[:, None]
+    norms[norms == 0] = 1
+    return np.ascontiguousarray(vectors / norms, dtype=np.float32)
 
 
-def cosine_similarity(matrix: np.ndarray, vector: np.ndarray) -> np.ndarray:
-    """Compute cosine similarity between each row in matrix and vector."""
+def cosine_similarity(
+    matrix: np.ndarray, vector: np.ndarray, use_numba: bool = False
+) -> np.ndarray:
+    """Compute cosine similarity between each row in matrix and vector.
+
+    Rows of ``matrix`` are expected to be unit-norm (see ``normalize_rows``),
+    so only the query vector needs normalizing. ``matrix`` may be a read-only
+    memmap and is never modified. ``use_numba`` opts into the parallel kernel
+    in ``app._simd`` for large matrices.
+    """
     if matrix.ndim != 2 or vector.ndim != 1:
         raise ValueError("向量维度不匹配")
 
-    matrix_norm = np.linalg.norm(matrix, axis=1)
-    vector_norm = np.linalg.norm(vector)
-
+    vector = np.ascontiguousarray(vector, dtype=np.float32)
+    vector_norm = float(np.sqrt(np.vdot(vector, vector)))
     if vector_norm == 0:
         return np.zeros(matrix.shape[0], dtype=np.float32)
 
-    denom = matrix_norm * vector_norm
-    denom = np.where(denom == 0, 1e-12, denom)
+    return dot_rows(matrix, vector / np.float32(max(vector_norm, 1e-12)), use_numba)
+
 
-    return (matrix @ vector) / denom
+def quantized_similarity(
+    q_matrix: np.ndarray, scales: np.ndarray, vector: np.ndarray
+) -> np.ndarray:
+    """Cosine similarity against an int8-quantized, unit-norm matrix.
+
+    The query is normalized and quantized the same way, the dot product is
+    accumulated in int32 and both scales are applied afterwards.
+    """
+    if q_matrix.ndim != 2 or vector.ndim != 1:
+        raise ValueError("向量维度不匹配")
+
+    vector = np.asarray(vector, dtype=np.float32)
+    max_abs = float(np.max(np.abs(vector))) if vector.size else 0.0
+    vector_norm = float(np.sqrt(np.vdot(vector, vector)))
+    if max_abs == 0 or vector_norm == 0:
+        return np.zeros(q_matrix.shape[0], dtype=np.float32)
+
+    q_scale = max_abs / 127.0
+    q_query = np.round(vector / q_scale).astype(np.int8)
+    dots = np.einsum("ij,j->i", q_matrix, q_query, dtype=np.int32)
+    return dots.astype(np.float32) * (scales * np.float32(q_scale / vector_norm))
+
+
+def top_k_indices(scores: np.ndarray, top_k: int) -> np.ndarray:
+    """Indices of the top_k highest scores, best first, without a full sort."""
+    k = min(top_k, scores.shape[0])
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+    part = np.argpartition(-scores, k - 1)[:k]
+    return part[np.argsort(-scores[part])]
+
+
+def embed_query(query: str, config: Dict | None = None) -> np.ndarray:
+    cfg = config or get_config()
+    return embed_texts([query], get_base_url(cfg), get_embed_model(cfg))[0]
 
 
 def retrieve(
-    company: str, query: str, top_k: int = 4, config: Dict | None = None
+    company: str,
+    query: str,
+    top_k: int = 4,
+    config: Dict | None = None,
+    query_vec: np.ndarray | None = None,
 ) -> List[Dict]:
-    cfg = config or load_config()
-    base_url = get_base_url(cfg)
-    embed_model = get_embed_model(cfg)
+    """Return the top_k chunks for query; pass query_vec to skip re-embedding."""
+    cfg = config or get_config()
 
     index = load_index(company)
     chunks = index.get("chunks") or []
-    texts = [chunk.get("text", "") for chunk in chunks] if chunks else index["texts"]
-    if not texts:
+    if not chunks and not index["texts"]:
         raise RuntimeError("索引中没有可用文本")
 
-    query_vec = embed_texts([query], base_url, embed_model)[0]
-    scores = cosine_similarity(index["vectors"], query_vec)
+    if query_vec is None:
+        query_vec = embed_query(query, cfg)
+    if index.get("scales") is not None:
+        scores = quantized_similarity(index["vectors"], index["scales"], query_vec)
+    else:
+        use_numba = str(cfg.get("NUMBA_SCORING", "false")).strip().lower() == "true"
+        scores = cosine_similarity(index["vectors"], query_vec, use_numba=use_numba)
 
-    top_indices = np.argsort(scores)[::-1][:top_k]
+    top_indices = top_k_indices(scores, top_k)
     results = []
     for rank, idx in enumerate(top_indices, start=1):
         if chunks:
@@ -266,8 +488,25 @@ def retrieve(
     return results
 
 
+def retrieve_many(
+    company: str,
+    queries: List[str],
+    top_k: int = 4,
+    config: Dict | None = None,
+) -> List[List[Dict]]:
+    """retrieve() for several queries, embedding them in a single batch."""
+    if not queries:
+        return []
+    cfg = config or get_config()
+    query_vecs = embed_texts(list(queries), get_base_url(cfg), get_embed_model(cfg))
+    return [
+        retrieve(company, query, top_k=top_k, config=cfg, query_vec=query_vec)
+        for query, query_vec in zip(queries, query_vecs)
+    ]
+
+
 def build_index(company: str, config: Dict | None = None) -> None:
-    cfg = config or load_config()
+    cfg = config or get_config()
     base_url = get_base_url(cfg)
     embed_model = get_embed_model(cfg)
 
@@ -308,5 +547,12 @@ def build_index(company: str, config: Dict | None = None) -> None:
     if not chunks:
         raise ValueError("sources.md 内容为空，无法建立索引")
 
-    vectors = embed_texts([chunk["text"] for chunk in chunks], base_url, embed_model)
-    save_index(company, chunks, vectors, embed_model)
+    texts = [chunk["text"] for chunk in chunks]
+    vectors = embed_texts(texts, base_url, embed_model)
+    save_index(
+        company,
+        chunks,
+        vectors,
+        embed_model,
+        quantize=str(cfg.get("INDEX_QUANTIZE", "")).strip().lower() == "int8",
+    )
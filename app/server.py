@@ -1,20 +1,36 @@
+import functools
 import json
 import logging
+import threading
 import uuid
-from datetime import datetime
+from datetime import datetime, timezone
 from pathlib import Path
 from typing import List
 from urllib.parse import quote
 
+import numpy as np
 import requests
+from requests.adapters import HTTPAdapter
 from fastapi import Depends, FastAPI, Header, HTTPException, Query, Response
 from fastapi.responses import FileResponse, HTMLResponse, JSONResponse, RedirectResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 
-from app.config import load_config
+try:
+    import orjson
+except ImportError:  # orjson 可选：缺失时回退到标准库 json
+    orjson = None
+
 from app.lang import detect_lang, language_name, normalize_lang
 from app.prompt import SYSTEM_PROMPT
-from app.rag import get_base_url, retrieve
+from app.rag import (
+    cosine_similarity,
+    embed_query,
+    get_base_url,
+    get_config,
+    get_embed_model,
+    load_index,
+    retrieve,
+)
 
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
 STATIC_DIR = PROJECT_ROOT / "static"
@@ -25,10 +41,21 @@ WHITEPAPER_INDEX = WHITEPAPERS_DIR / "index.json"
 logger = logging.getLogger("whitepapers")
 logging.basicConfig(level=logging.INFO)
 
-WHITEPAPER_CACHE = {
-    "mtime": None,
-    "items": [],
-}
+# 白皮书索引快照（key/items/by_id/latest）；更新时整体替换 "snapshot"，
+# 并发读取拿到的四个字段总是来自同一次加载
+_EMPTY_WHITEPAPERS = {"key": None, "items": [], "by_id": {}, "latest": None}
+WHITEPAPER_CACHE = {"snapshot": _EMPTY_WHITEPAPERS}
+# 缺失或无法解析的 published_at 排在最早
+_PUBLISHED_MIN = datetime.min.replace(tzinfo=timezone.utc)
+
+# 语义缓存：(company, lang) -> 近期问题向量与回答，问法相近时跳过 LLM 生成
+ANSWER_CACHE: dict[tuple[str, str], dict] = {}
+ANSWER_CACHE_LOCK = threading.Lock()
+
+# 复用到 Ollama 的连接（keep-alive），避免每次请求重新握手
+_SESSION = requests.Session()
+_SESSION.mount("http://", HTTPAdapter(pool_connections=32, pool_maxsize=32))
+_SESSION.mount("https://", HTTPAdapter(pool_connections=32, pool_maxsize=32))
 
 app = FastAPI(title="Company Agent Demo")
 
@@ -37,7 +64,7 @@ if STATIC_DIR.exists():
 
 
 def require_api_key(x_api_key: str | None = Header(None, alias="X-API-Key")) -> None:
-    config = load_config()
+    config = get_config()
     api_key = str(config.get("API_KEY", "")).strip()
     provided = (x_api_key or "").strip()
     if api_key and provided != api_key:
@@ -55,7 +82,7 @@ def call_chat(model: str, messages: List[dict], base_url: str) -> str:
     }
 
     try:
-        response = requests.post(
+        response = _SESSION.post(
             f"{base_url}/api/chat",
             json=payload,
             timeout=120,
@@ -94,7 +121,7 @@ def list_companies() -> list[dict]:
         meta_path = path / "sources_meta.json"
         if meta_path.exists():
             try:
-                meta = json.loads(meta_path.read_text(encoding="utf-8"))
+                meta = json_loads(meta_path.read_bytes())
             except (OSError, ValueError):
                 meta = {}
             if isinstance(meta, dict):
@@ -109,26 +136,38 @@ def list_companies() -> list[dict]:
     return sorted(companies, key=lambda item: item.get("slug", ""))
 
 
+def json_loads(data: bytes | str):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
 def load_whitepapers() -> list[dict]:
+    return _whitepaper_snapshot()["items"]
+
+
+def _whitepaper_snapshot() -> dict:
     if not WHITEPAPER_INDEX.exists():
-        return []
+        return _EMPTY_WHITEPAPERS
 
     try:
-        mtime = WHITEPAPER_INDEX.stat().st_mtime
+        stat = WHITEPAPER_INDEX.stat()
     except OSError:
-        return []
+        return _EMPTY_WHITEPAPERS
 
-    if WHITEPAPER_CACHE["mtime"] == mtime:
-        return WHITEPAPER_CACHE["items"]
+    # mtime 精度有限，同一时刻内的改写靠文件大小区分
+    key = (stat.st_mtime_ns, stat.st_size)
+    snapshot = WHITEPAPER_CACHE["snapshot"]
+    if snapshot["key"] == key:
+        return snapshot
 
     try:
-        raw = WHITEPAPER_INDEX.read_text(encoding="utf-8")
-        data = json.loads(raw)
+        data = json_loads(WHITEPAPER_INDEX.read_bytes())
     except (OSError, ValueError):
-        return []
+        return _EMPTY_WHITEPAPERS
 
     if not isinstance(data, list):
-        return []
+        return _EMPTY_WHITEPAPERS
 
     items = []
     for item in data:
@@ -145,25 +184,44 @@ def load_whitepapers() -> list[dict]:
             }
         )
 
-    WHITEPAPER_CACHE["mtime"] = mtime
-    WHITEPAPER_CACHE["items"] = items
-    return items
+    by_id: dict[str, dict] = {}
+    for item in items:
+        # 与原先线性查找一致：重复 id 以第一个为准
+        by_id.setdefault(item["id"], item)
+
+    snapshot = {
+        "key": key,
+        "items": items,
+        "by_id": by_id,
+        "latest": (
+            max(items, key=lambda item: parse_published_at(item.get("published_at", "")))
+            if items
+            else None
+        ),
+    }
+    WHITEPAPER_CACHE["snapshot"] = snapshot
+    return snapshot
 
 
 def get_whitepaper_by_id(whitepaper_id: str) -> dict | None:
-    for item in load_whitepapers():
-        if item.get("id") == whitepaper_id:
-            return item
-    return None
+    return _whitepaper_snapshot()["by_id"].get(whitepaper_id)
+
+
+def get_latest_whitepaper() -> dict | None:
+    return _whitepaper_snapshot()["latest"]
 
 
 def parse_published_at(value: str) -> datetime:
+    # 统一成带时区的 UTC：index.json 里纯日期与带偏移的时间混用时也能比较
     if not value:
-        return datetime.min
+        return _PUBLISHED_MIN
     try:
-        return datetime.fromisoformat(value)
+        parsed = datetime.fromisoformat(value)
     except ValueError:
-        return datetime.min
+        return _PUBLISHED_MIN
+    if parsed.tzinfo is None:
+        return parsed.replace(tzinfo=timezone.utc)
+    return parsed
 
 
 def resolve_whitepaper_file(file_name: str) -> Path | None:
@@ -189,10 +247,15 @@ def build_deep_link(url: str, snippet: str) -> str:
     return f"{url}#:~:text={quote(snippet)}"
 
 
-def format_sources(sources: List[dict]) -> List[dict]:
-    formatted = []
+def build_context_and_sources(sources: List[dict]) -> tuple[str, List[dict]]:
+    """Build the LLM context block and the client-facing sources in one pass."""
+    lines: List[str] = []
+    formatted: List[dict] = []
     for item in sources:
-        snippet = build_snippet(item.get("text", ""))
+        text = item.get("text", "")
+        idx = item.get("idx", 0)
+        lines.append(f"[{idx}] {text}")
+        snippet = build_snippet(text)
         url = item.get("url", "")
         formatted.append(
             {
@@ -202,12 +265,13 @@ def format_sources(sources: List[dict]) -> List[dict]:
                 "url": url,
                 "deep_link": build_deep_link(url, snippet),
                 "snippet": snippet,
-                "idx": item.get("idx", 0),
+                "idx": idx,
             }
         )
-    return formatted
+    return "\n".join(lines), formatted
 
 
+@functools.lru_cache(maxsize=64)
 def build_system_prompt(lang_code: str) -> str:
     return (
         SYSTEM_PROMPT
@@ -225,31 +289,40 @@ def build_user_prompt(context: str, question: str) -> str:
     )
 
 
+@functools.lru_cache(maxsize=1024)
+def detect_lang_cached(text: str) -> str:
+    return detect_lang(text)
+
+
 def resolve_language(lang: str | None, question: str) -> str:
     if lang is None or not lang.strip():
-        return detect_lang(question)
+        # 截断到 256 字符：限制缓存键大小，语言判断也不需要更长的文本
+        return detect_lang_cached(question[:256])
     return normalize_lang(lang)
 
 
-def build_context(sources: List[dict]) -> str:
-    return "\n".join(f"[{item['idx']}] {item['text']}" for item in sources)
-
-
 def chat_response(company: str, question: str, lang: str | None) -> dict:
     if not question.strip():
         raise HTTPException(status_code=400, detail="问题不能为空")
 
-    config = load_config()
+    config = get_config()
     top_k = int(config.get("TOP_K", 8))
+    target_lang = resolve_language(lang, question)
     try:
-        sources = retrieve(company, question, top_k=top_k, config=config)
+        query_vec = embed_query(question, config)
+        version = load_index(company)["version"]
+        cached = lookup_cached_answer(company, target_lang, version, query_vec, config)
+        if cached is not None:
+            return cached
+        sources = retrieve(
+            company, question, top_k=top_k, config=config, query_vec=query_vec
+        )
     except FileNotFoundError as exc:
         raise HTTPException(status_code=404, detail=str(exc))
     except Exception as exc:
         raise HTTPException(status_code=500, detail=str(exc))
 
-    target_lang = resolve_language(lang, question)
-    context = build_context(sources)
+    context, formatted = build_context_and_sources(sources)
     answer = call_chat(
         str(config.get("LLM_MODEL", "")),
         [
@@ -259,15 +332,74 @@ def chat_response(company: str, question: str, lang: str | None) -> dict:
         get_base_url(config),
     )
 
-    return {
+    result = {
         "answer": answer,
         "language": target_lang,
-        "sources": format_sources(sources),
+        "sources": formatted,
     }
+    store_cached_answer(company, target_lang, version, query_vec, result, config)
+    return result
+
+
+def _answer_cache_stamp(version: object, config: dict) -> tuple:
+    # 索引、生成模型、检索条数或向量模型任一变化（重建索引或改配置）都会让旧回答失效
+    return (
+        version,
+        str(config.get("LLM_MODEL", "")),
+        int(config.get("TOP_K", 8)),
+        get_embed_model(config),
+    )
 
 
-def sse_event(event: str, payload: dict) -> str:
-    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+def lookup_cached_answer(
+    company: str, lang: str, version: object, query_vec: np.ndarray, config: dict
+) -> dict | None:
+    """Return a cached chat payload whose question is close enough to query_vec."""
+    threshold = float(config.get("SEMANTIC_CACHE_THRESHOLD", 0.95))
+    stamp = _answer_cache_stamp(version, config)
+    with ANSWER_CACHE_LOCK:
+        entry = ANSWER_CACHE.get((company, lang))
+        if not entry or entry["version"] != stamp or not entry["payloads"]:
+            return None
+        scores = cosine_similarity(entry["vectors"], query_vec)
+        best = int(np.argmax(scores))
+        if scores[best] < threshold:
+            return None
+        return entry["payloads"][best]
+
+
+def store_cached_answer(
+    company: str,
+    lang: str,
+    version: object,
+    query_vec: np.ndarray,
+    payload: dict,
+    config: dict,
+) -> None:
+    max_size = int(config.get("SEMANTIC_CACHE_SIZE", 512))
+    norm = float(np.sqrt(np.vdot(query_vec, query_vec)))
+    if max_size <= 0 or norm == 0:
+        return
+
+    unit = (query_vec / norm).astype(np.float32)[None, :]
+    key = (company, lang)
+    stamp = _answer_cache_stamp(version, config)
+    with ANSWER_CACHE_LOCK:
+        entry = ANSWER_CACHE.get(key)
+        if not entry or entry["version"] != stamp:
+            # 索引重建或模型/TOP_K 配置变化后旧回答可能失效，整体丢弃
+            entry = {"version": stamp, "vectors": unit[:0], "payloads": []}
+            ANSWER_CACHE[key] = entry
+        entry["vectors"] = np.vstack([entry["vectors"], unit])[-max_size:]
+        entry["payloads"] = (entry["payloads"] + [payload])[-max_size:]
+
+
+def sse_event(event: str, payload: dict) -> bytes:
+    if orjson is not None:
+        body = orjson.dumps(payload)
+    else:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    return b"event: " + event.encode("utf-8") + b"\ndata: " + body + b"\n\n"
 
 
 @app.get("/")
@@ -315,7 +447,7 @@ def whitepaper_file(whitepaper_id: str):
         )
         return JSONResponse(status_code=404, content={"detail": "文件不存在"})
 
-    cache_seconds = int(load_config().get("WHITEPAPER_CACHE_SECONDS", 3600))
+    cache_seconds = int(get_config().get("WHITEPAPER_CACHE_SECONDS", 3600))
     headers = {
         "Content-Disposition": f'inline; filename="{file_path.name}"',
         "Cache-Control": f"public, max-age={cache_seconds}",
@@ -332,12 +464,11 @@ def whitepaper_file(whitepaper_id: str):
 @app.get("/whitepaper/latest")
 def whitepaper_latest():
     request_id = str(uuid.uuid4())
-    items = load_whitepapers()
-    if not items:
+    latest = get_latest_whitepaper()
+    if not latest:
         logger.info("[whitepapers] request_id=%s latest_not_found", request_id)
         return JSONResponse(status_code=404, content={"detail": "暂无白皮书"})
 
-    latest = max(items, key=lambda item: parse_published_at(item.get("published_at", "")))
     logger.info(
         "[whitepapers] request_id=%s latest_id=%s",
         request_id,
@@ -406,7 +537,7 @@ def company_faq(slug: str) -> dict:
     if not faq_path.exists():
         return {"slug": slug, "items": []}
     try:
-        return json.loads(faq_path.read_text(encoding="utf-8"))
+        return json_loads(faq_path.read_bytes())
     except (OSError, ValueError):
         raise HTTPException(status_code=500, detail="FAQ 文件损坏或无法读取")
 
@@ -436,17 +567,36 @@ def chat_stream(company: str, question: str, lang: str | None) -> StreamingRespo
     if not question.strip():
         raise HTTPException(status_code=400, detail="问题不能为空")
 
-    config = load_config()
+    config = get_config()
     top_k = int(config.get("TOP_K", 8))
+    target_lang = resolve_language(lang, question)
     try:
-        sources = retrieve(company, question, top_k=top_k, config=config)
+        query_vec = embed_query(question, config)
+        version = load_index(company)["version"]
+        cached = lookup_cached_answer(company, target_lang, version, query_vec, config)
+        sources = []
+        if cached is None:
+            sources = retrieve(
+                company, question, top_k=top_k, config=config, query_vec=query_vec
+            )
     except FileNotFoundError as exc:
         raise HTTPException(status_code=404, detail=str(exc))
     except Exception as exc:
         raise HTTPException(status_code=500, detail=str(exc))
 
-    target_lang = resolve_language(lang, question)
-    context = build_context(sources)
+    if cached is not None:
+
+        def cached_stream():
+            yield sse_event("delta", {"text": cached["answer"]})
+            yield sse_event(
+                "sources",
+                {"sources": cached["sources"], "language": cached["language"]},
+            )
+            yield sse_event("done", {})
+
+        return StreamingResponse(cached_stream(), media_type="text/event-stream")
+
+    context, formatted = build_context_and_sources(sources)
     payload = {
         "model": str(config.get("LLM_MODEL", "")),
         "messages": [
@@ -461,8 +611,10 @@ def chat_stream(company: str, question: str, lang: str | None) -> StreamingRespo
         raise HTTPException(status_code=500, detail="LLM_MODEL 未配置")
 
     def event_stream():
+        answer_parts: list[str] = []
+        finished = False
         try:
-            response = requests.post(
+            response = _SESSION.post(
                 f"{base_url}/api/chat",
                 json=payload,
                 timeout=120,
@@ -479,14 +631,15 @@ def chat_stream(company: str, question: str, lang: str | None) -> StreamingRespo
                     "message": f"Ollama 接口错误 {response.status_code}: {response.text}"
                 },
             )
+            response.close()
             return
 
         try:
-            for line in response.iter_lines(decode_unicode=True):
+            for line in response.iter_lines():
                 if not line:
                     continue
                 try:
-                    data = json.loads(line)
+                    data = json_loads(line)
                 except ValueError:
                     continue
                 if data.get("error"):
@@ -495,17 +648,33 @@ def chat_stream(company: str, question: str, lang: str | None) -> StreamingRespo
                 message = data.get("message", {})
                 content = message.get("content", "")
                 if content:
+                    answer_parts.append(content)
                     yield sse_event("delta", {"text": content})
                 if data.get("done"):
+                    finished = True
                     break
         except requests.RequestException as exc:
             yield sse_event("error", {"message": f"Ollama 流式中断: {exc}"})
             return
-
+        finally:
+            # 流式响应需显式关闭，连接才会归还给连接池
+            response.close()
+
+        answer = "".join(answer_parts).strip()
+        # 只缓存完整结束（收到 done）的回答，中途断开的截断回答不能复用
+        if answer and finished:
+            store_cached_answer(
+                company,
+                target_lang,
+                version,
+                query_vec,
+                {"answer": answer, "language": target_lang, "sources": formatted},
+                config,
+            )
         yield sse_event(
             "sources",
             {
-                "sources": format_sources(sources),
+                "sources": formatted,
                 "language": target_lang,
             },
         )
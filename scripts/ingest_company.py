@@ -1,15 +1,23 @@
 import argparse
+import atexit
 import gzip
-import heapq
+import hashlib
 import json
+import os
 import re
 import sys
+import threading
 import time
 from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
+from io import BytesIO
+from functools import lru_cache
+from itertools import count, islice
 from pathlib import Path
 from typing import Iterable, Optional
 from urllib.parse import (
+    ParseResult,
     parse_qsl,
     quote,
     urlencode,
@@ -17,9 +25,22 @@ from urllib.parse import (
     urlparse,
 )
 
+import lxml.html
 import requests
-from bs4 import BeautifulSoup
+from lxml import etree
+from requests.adapters import HTTPAdapter
 from trafilatura import extract
+from urllib3.util.retry import Retry
+
+try:
+    import orjson
+except ImportError:  # orjson 可选：缺失时回退到标准库 json
+    orjson = None
+
+try:
+    import xxhash
+except ImportError:  # xxhash 可选：缺失时用 hashlib.blake2b
+    xxhash = None
 
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
 sys.path.insert(0, str(PROJECT_ROOT))
@@ -160,6 +181,11 @@ KNOWN_LANG_CODES = {
     "vi",
 }
 
+# 允许带地区后缀的语言基码（en-us、pt-br 等）
+_KNOWN_LANG_BASES = frozenset(
+    {"en", "zh", "fr", "de", "es", "it", "pt", "ru", "ja", "ko", "nl", "sv", "no", "da", "fi", "pl", "tr", "ar", "he", "id", "th", "vi"}
+)
+
 # 常见地区前缀（非语言）：用于 bucket/priority 识别时剥离，如 /us/products...
 COMMON_REGION_PREFIXES = {
     "us",
@@ -177,16 +203,71 @@ COMMON_REGION_PREFIXES = {
     "hk",
 }
 
+# 扩展名/低价值路径各合并成一个正则，逐 URL 只做两次 C 层扫描
+_EXCLUDED_EXT_RE = re.compile(
+    r"(?:"
+    + "|".join(re.escape(e) for e in sorted(EXCLUDE_EXTENSIONS, key=len, reverse=True))
+    + r")$"
+)
+_EXCLUDED_PATH_RE = re.compile(
+    "|".join(re.escape(p) for p in sorted(EXCLUDE_PATH_SUBSTRINGS, key=len, reverse=True))
+)
+_JS_HEAVY_RE = re.compile(
+    r'id="__next"|__next_data__|window\.__nuxt__|id="__nuxt"|data-reactroot'
+    r"|enable javascript|requires javascript",
+    re.IGNORECASE,
+)
+_NOSCRIPT_RE = re.compile(r"<noscript", re.IGNORECASE)
+_SCRIPT_TAG_RE = re.compile(r"<script", re.IGNORECASE)
+_LANG_TOKEN_RE = re.compile(r"[a-z]{2}(-[a-z]{2,4})?")
+_CFEMAIL_HREF_RE = re.compile(r"/cdn-cgi/l/email-protection#([0-9a-fA-F]+)")
+_CFEMAIL_XPATH = (
+    "//a[contains(concat(' ', normalize-space(@class), ' '), ' __cf_email__ ')"
+    " or contains(@href, '/cdn-cgi/l/email-protection#')]"
+)
+_SPLIT_RE = re.compile(r"[,\s]+")
+# 页内锚点 / 邮件 / 电话 / 脚本链接不入队
+_SKIP_HREF_PREFIXES = ("#", "mailto:", "tel:", "javascript:")
+# 日文假名 + 韩文 Hangul
+_JP_KR_RE = re.compile(r"[\u3040-\u30ff\uac00-\ud7af]")
+_SIMPLE_QUERY_RE = re.compile(r"[\w.~-]+=[\w.~-]+(?:&[\w.~-]+=[\w.~-]+)*", re.ASCII)
+_TRACKING_NEEDLE_RE = re.compile(
+    "|".join(re.escape(k) for k in sorted(TRACKING_QUERY_KEYS | set(TRACKING_QUERY_PREFIXES), key=len, reverse=True)),
+    re.IGNORECASE,
+)
+
+
+# URL 在发现/入队/出队各阶段会被反复解析，按原串缓存解析结果
+@lru_cache(maxsize=16384)
+def _parse(url: str) -> ParseResult:
+    return urlparse(url)
+
+
 def canonical_lang(code: str) -> str:
     c = (code or "").strip().lower().replace("_", "-")
     return LANG_ALIASES.get(c, c)
 
-def parse_keep_langs(s: str) -> set[str]:
-    parts = re.split(r"[,\s]+", (s or "").strip())
-    out = {canonical_lang(p) for p in parts if p}
-    # 兜底：至少保留英文
-    return out or {"en"}
+def parse_keep_langs(s: str) -> frozenset[str]:
+    parts = _SPLIT_RE.split((s or "").strip())
+    out = frozenset(canonical_lang(p) for p in parts if p)
+    # 兜底：至少保留英文；frozenset 可哈希，便于下游 lru_cache
+    return out or frozenset({"en"})
+
+def _is_lang_token(tok: str) -> bool:
+    t = (tok or "").strip().lower().replace("_", "-")
+    if not t:
+        return False
+    # only accept known language codes to avoid /us/, /uk/ etc.
+    if t in KNOWN_LANG_CODES:
+        return True
+    # allow variants like en-us, pt-br only if the base is known
+    if _LANG_TOKEN_RE.fullmatch(t):
+        base = t.split("-", 1)[0]
+        return base in _KNOWN_LANG_BASES
+    return False
+
 
+@lru_cache(maxsize=65536)
 def extract_lang_from_url(url: str) -> str:
     """Try to detect a language code from subdomain or first path segment.
 
@@ -195,24 +276,11 @@ def extract_lang_from_url(url: str) -> str:
       - example.com/fr/... -> fr
       - example.com/zh-cn/... -> zh-cn
     """
-    p = urlparse(url)
+    p = _parse(url)
 
     host = (p.netloc or "").lower()
     labels = [x for x in host.split(".") if x]
 
-    def _is_lang_token(tok: str) -> bool:
-        t = (tok or "").strip().lower().replace("_", "-")
-        if not t:
-            return False
-        # only accept known language codes to avoid /us/, /uk/ etc.
-        if t in KNOWN_LANG_CODES:
-            return True
-        # allow variants like en-us, pt-br only if the base is known
-        if re.fullmatch(r"[a-z]{2}(-[a-z]{2,4})?", t):
-            base = t.split("-", 1)[0]
-            return base in {"en", "zh", "fr", "de", "es", "it", "pt", "ru", "ja", "ko", "nl", "sv", "no", "da", "fi", "pl", "tr", "ar", "he", "id", "th", "vi"}
-        return False
-
     # language subdomain: fr.example.com / zh-cn.example.com
     if len(labels) >= 3:
         first = labels[0]
@@ -231,6 +299,7 @@ def extract_lang_from_url(url: str) -> str:
     return ""
 
 
+@lru_cache(maxsize=65536)
 def normalize_url(raw_url: str) -> str:
     url = (raw_url or "").strip()
     if not url:
@@ -238,10 +307,10 @@ def normalize_url(raw_url: str) -> str:
     if url.startswith("//"):
         url = "https:" + url
 
-    parsed = urlparse(url)
+    parsed = _parse(url)
     if not parsed.scheme:
         url = "https://" + url
-        parsed = urlparse(url)
+        parsed = _parse(url)
 
     # drop fragment, normalize netloc, strip tracking query params
     netloc = (parsed.netloc or "").lower()
@@ -251,37 +320,38 @@ def normalize_url(raw_url: str) -> str:
     return parsed.geturl()
 
 
+def _is_tracking_key(key: str) -> bool:
+    kl = (key or "").lower()
+    return kl in TRACKING_QUERY_KEYS or kl.startswith(TRACKING_QUERY_PREFIXES)
+
+
 def strip_tracking_query(query: str) -> str:
     if not query:
         return ""
+    if _SIMPLE_QUERY_RE.fullmatch(query):
+        # 只含安全字符的 k=v 串经 parse_qsl + urlencode 往返不变：
+        # 无跟踪参数时原样返回，否则按 & 直接过滤
+        if not _TRACKING_NEEDLE_RE.search(query):
+            return query
+        return "&".join(kv for kv in query.split("&") if not _is_tracking_key(kv.split("=", 1)[0]))
     pairs = parse_qsl(query, keep_blank_values=False)
-    kept = []
-    for k, v in pairs:
-        kl = (k or "").lower()
-        if kl in TRACKING_QUERY_KEYS:
-            continue
-        if any(kl.startswith(p) for p in TRACKING_QUERY_PREFIXES):
-            continue
-        kept.append((k, v))
+    kept = [(k, v) for k, v in pairs if not _is_tracking_key(k)]
     return urlencode(kept, doseq=True)
 
 
-def is_same_domain(url: str, allowed_netloc: str) -> bool:
-    if not allowed_netloc:
-        return True
-    netloc = urlparse(url).netloc.lower()
-    allowed = allowed_netloc.lower()
-    if netloc == allowed:
+def _same_domain(url: str, allowed: str, allowed_suffix: str) -> bool:
+    """True if url's host is allowed or one of its subdomains (allowed is lowercased, suffix is "." + allowed)."""
+    if not allowed:
         return True
-    return netloc.endswith("." + allowed)
-
-
+    netloc = _parse(url).netloc.lower()
+    return netloc == allowed or netloc.endswith(allowed_suffix)
 
 
-def get_skip_reason(url: str, allowed_langs: set[str]) -> str:
+@lru_cache(maxsize=65536)
+def get_skip_reason(url: str, allowed_langs: frozenset[str]) -> str:
     """Return a non-empty reason string if the URL should be skipped."""
     try:
-        p = urlparse(url)
+        p = _parse(url)
     except Exception:
         return "bad_url"
 
@@ -296,49 +366,89 @@ def get_skip_reason(url: str, allowed_langs: set[str]) -> str:
     path = (p.path or "").lower()
 
     # file extension filter
-    for ext in EXCLUDE_EXTENSIONS:
-        if path.endswith(ext):
-            return f"excluded_ext:{ext}"
+    m = _EXCLUDED_EXT_RE.search(path)
+    if m:
+        return f"excluded_ext:{m.group(0)}"
 
     # obvious low-value paths
-    for sub in EXCLUDE_PATH_SUBSTRINGS:
-        if sub in path:
-            return f"excluded_path:{sub}"
+    m = _EXCLUDED_PATH_RE.search(path)
+    if m:
+        return f"excluded_path:{m.group(0)}"
 
     return ""
 
 
-def should_skip_url(url: str, allowed_langs: set[str]) -> bool:
+def should_skip_url(url: str, allowed_langs: frozenset[str]) -> bool:
     return bool(get_skip_reason(url, allowed_langs))
 
 
+def _parse_html(html: str) -> Optional[lxml.html.HtmlElement]:
+    """Parse HTML with lxml directly; None if the document is empty/unparsable."""
+    try:
+        return lxml.html.document_fromstring(html)
+    except ValueError:
+        # 带 XML 编码声明的 str 只能按 bytes 解析
+        try:
+            return lxml.html.document_fromstring(html.encode("utf-8"))
+        except (etree.ParserError, ValueError):
+            return None
+    except etree.ParserError:
+        return None
+
+
+def _iter_tree_hrefs(doc: lxml.html.HtmlElement) -> Iterable[str]:
+    for tag in doc.iter("a"):
+        yield tag.get("href") or ""
+
+
 def extract_links(html: str, base_url: str) -> Iterable[str]:
-    soup = BeautifulSoup(html, "lxml")
-    for tag in soup.find_all("a", href=True):
-        href = (tag.get("href", "") or "").strip()
-        if not href:
-            continue
-        if href.startswith("#"):
-            continue
-        if href.startswith("mailto:") or href.startswith("tel:"):
-            continue
-        if href.startswith("javascript:"):
+    doc = _parse_html(html)
+    return extract_links_from_tree(doc, base_url) if doc is not None else ()
+
+
+def extract_links_from_tree(doc: lxml.html.HtmlElement, base_url: str) -> Iterable[str]:
+    return _filter_links(_iter_tree_hrefs(doc), base_url)
+
+
+def _filter_links(hrefs: Iterable[str], base_url: str) -> Iterable[str]:
+    for href in hrefs:
+        href = href.strip()
+        if not href or href.startswith(_SKIP_HREF_PREFIXES):
             continue
         full_url = normalize_url(urljoin(base_url, href))
         if full_url:
             yield full_url
 
 
-def extract_title(html: str) -> str:
-    soup = BeautifulSoup(html, "lxml")
-    title = soup.title.string if soup.title else ""
-    return (title or "").strip()
+def extract_title_from_tree(doc: lxml.html.HtmlElement) -> str:
+    node = doc.find(".//title")
+    return node.text_content().strip() if node is not None else ""
 
 
 def save_text(path: Path, text: str) -> None:
     path.write_text(text, encoding="utf-8")
 
 
+def has_jp_kr(text: str) -> bool:
+    """True if text contains any Japanese kana or Korean Hangul (stops at the first hit)."""
+    return _JP_KR_RE.search(text) is not None
+
+
+def _content_hash(text: str) -> str:
+    data = text.encode("utf-8")
+    if xxhash is not None:
+        return xxhash.xxh64(data).hexdigest()
+    return hashlib.blake2b(data, digest_size=8).hexdigest()
+
+
+def json_dumps_bytes(obj, indent: bool = True) -> bytes:
+    """Serialize to UTF-8 JSON bytes (orjson when available), 2-space indented by default."""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+        return orjson.dumps(obj, option=option)
+    return json.dumps(obj, ensure_ascii=False, indent=2 if indent else None).encode("utf-8")
+
+
 def build_sources_md(
     company_dir: Path,
     name: str,
@@ -346,36 +456,31 @@ def build_sources_md(
     fetched_at: str,
     pages: list[dict],
 ) -> None:
-    lines = [f"# {name}", "", f"官网：{website}", f"导入时间：{fetched_at}", ""]
-
     extracted_pages = [p for p in pages if p.get("text")]
-    if not extracted_pages:
-        lines.append("暂无可用正文内容。")
-        lines.append("")
-    else:
-        for page in extracted_pages:
+
+    sources_path = company_dir / "sources.md"
+    # 逐页写入文件，不再把全部正文先拼成一个大字符串
+    with sources_path.open("w", encoding="utf-8") as f:
+        f.write(f"# {name}\n\n官网：{website}\n导入时间：{fetched_at}\n\n")
+        if not extracted_pages:
+            f.write("暂无可用正文内容。\n")
+            return
+
+        for i, page in enumerate(extracted_pages):
             page_id = page["id"]
             text = page["text"].strip()
             url = page["url"]
             title = (page.get("title") or "").strip()
             rendered = bool(page.get("rendered", False))
 
-            lines.append(f"## 页面 {page_id}")
+            if i:
+                f.write("\n")
+            f.write(f"## 页面 {page_id}\n")
             if title:
-                lines.append(f"标题：{title}")
-                lines.append("")
+                f.write(f"标题：{title}\n\n")
             if rendered:
-                lines.append("（JS 渲染抓取）")
-                lines.append("")
-
-            lines.append(text)
-            lines.append("")
-            lines.append("来源：")
-            lines.append(f"- {url}")
-            lines.append("")
-
-    sources_path = company_dir / "sources.md"
-    save_text(sources_path, "\n".join(lines).strip() + "\n")
+                f.write("（JS 渲染抓取）\n\n")
+            f.write(f"{text}\n\n来源：\n- {url}\n")
 
 
 def build_snippet(text: str, max_len: int = 100) -> str:
@@ -389,20 +494,180 @@ def build_deep_link(url: str, snippet: str) -> str:
     return f"{url}#:~:text={quote(snippet)}"
 
 
+def _build_session() -> requests.Session:
+    session = requests.Session()
+    session.headers.update(
+        {
+            "User-Agent": USER_AGENT,
+            # 尽量避免站点按 Geo/IP 默认跳到日/韩/欧语版本
+            "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8",
+        }
+    )
+    retry = Retry(total=2, backoff_factor=0.3, status_forcelist=[502, 503, 504])
+    adapter = HTTPAdapter(pool_connections=32, pool_maxsize=64, max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+# 抓取全程复用连接（keep-alive），省去每个请求的 TCP/TLS 握手
+_SESSION = _build_session()
+
+
+# 条件请求缓存：按 URL 记录 ETag/Last-Modified 与响应体，重复导入时服务端可直接回 304
+HTTP_CACHE_DIR = COMPANIES_DIR / ".http_cache"
+HTTP_CACHE_ENABLED = True
+# 条目自上次写入/304 确认起超过该时长即失效并删除
+HTTP_CACHE_TTL_SECONDS = 7 * 24 * 3600
+# 缓存目录总大小上限，超出时按最近使用时间淘汰最旧的条目
+HTTP_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+
+def _http_cache_paths(url: str) -> tuple[Path, Path]:
+    key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+    return HTTP_CACHE_DIR / f"{key}.json", HTTP_CACHE_DIR / f"{key}.body"
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    tmp = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+def _load_http_cache(url: str) -> Optional[dict]:
+    meta_path, body_path = _http_cache_paths(url)
+    try:
+        if time.time() - meta_path.stat().st_mtime > HTTP_CACHE_TTL_SECONDS:
+            _remove_http_cache_entry(meta_path, body_path)
+            return None
+        meta = json.loads(meta_path.read_bytes())
+    except (OSError, ValueError):
+        return None
+    if not body_path.exists():
+        return None
+    return meta
+
+
+def _remove_http_cache_entry(meta_path: Path, body_path: Path) -> None:
+    # 先删 meta：meta 不在时 body 不会被使用
+    for path in (meta_path, body_path):
+        try:
+            path.unlink()
+        except OSError:
+            pass
+
+
+def prune_http_cache() -> int:
+    """Delete expired entries, then the least recently used ones above HTTP_CACHE_MAX_BYTES.
+
+    Returns the number of entries removed.
+    """
+    entries = []
+    now = time.time()
+    removed = 0
+    try:
+        meta_paths = list(HTTP_CACHE_DIR.glob("*.json"))
+    except OSError:
+        return 0
+    for meta_path in meta_paths:
+        body_path = meta_path.with_suffix(".body")
+        try:
+            used_at = meta_path.stat().st_mtime
+            size = body_path.stat().st_size
+        except OSError:
+            _remove_http_cache_entry(meta_path, body_path)
+            removed += 1
+            continue
+        if now - used_at > HTTP_CACHE_TTL_SECONDS:
+            _remove_http_cache_entry(meta_path, body_path)
+            removed += 1
+            continue
+        entries.append((used_at, size, meta_path, body_path))
+
+    total = sum(size for _, size, _, _ in entries)
+    entries.sort()
+    for _, size, meta_path, body_path in entries:
+        if total <= HTTP_CACHE_MAX_BYTES:
+            break
+        _remove_http_cache_entry(meta_path, body_path)
+        total -= size
+        removed += 1
+    return removed
+
+
+def _store_http_cache(url: str, resp: requests.Response) -> None:
+    etag = resp.headers.get("etag") or ""
+    last_modified = resp.headers.get("last-modified") or ""
+    if not etag and not last_modified:
+        return
+    meta_path, body_path = _http_cache_paths(url)
+    meta = {
+        "url": resp.url,
+        "etag": etag,
+        "last_modified": last_modified,
+        "content_type": resp.headers.get("content-type") or "",
+    }
+    try:
+        HTTP_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        # 先写 body 再写 meta：meta 存在即代表 body 完整
+        _write_atomic(body_path, resp.content)
+        _write_atomic(meta_path, json_dumps_bytes(meta, indent=False))
+    except OSError:
+        pass
+
+
+def _cached_response(meta: dict, body: bytes, request: requests.PreparedRequest) -> requests.Response:
+    resp = requests.Response()
+    resp.status_code = 200
+    resp._content = body
+    resp.url = meta.get("url") or request.url
+    resp.request = request
+    if meta.get("content_type"):
+        resp.headers["content-type"] = meta["content_type"]
+    resp.encoding = requests.utils.get_encoding_from_headers(resp.headers)
+    return resp
+
+
 def _requests_get(url: str, timeout: int = 30) -> Optional[requests.Response]:
+    meta = _load_http_cache(url) if HTTP_CACHE_ENABLED else None
+    headers = {}
+    if meta:
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
     try:
-        return requests.get(
-            url,
-            headers={
-                "User-Agent": USER_AGENT,
-                # 尽量避免站点按 Geo/IP 默认跳到日/韩/欧语版本
-                "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8",
-            },
-            timeout=timeout,
-            allow_redirects=True,
-        )
+        resp = _SESSION.get(url, timeout=timeout, allow_redirects=True, headers=headers)
+        if resp.status_code == 304 and meta:
+            meta_path, body_path = _http_cache_paths(url)
+            try:
+                # 服务端确认未变：刷新 meta 的 mtime，作为 TTL 与淘汰的“最近使用”时间
+                os.utime(meta_path)
+                return _cached_response(meta, body_path.read_bytes(), resp.request)
+            except OSError:
+                # 缓存体丢失：退回普通请求
+                return _SESSION.get(url, timeout=timeout, allow_redirects=True)
     except requests.RequestException:
         return None
+    if HTTP_CACHE_ENABLED and resp.status_code == 200:
+        _store_http_cache(url, resp)
+    return resp
+
+
+# 站点探测（sitemap/feed 候选路径）时同时在途的请求数
+DISCOVERY_WORKERS = 8
+# 判断响应是否为 XML sitemap 时只检查开头这么多字节
+SITEMAP_SNIFF_BYTES = 2048
+# crawl_site 每批并发抓取的页面数
+FETCH_WORKERS = 8
+
+
+def _fetch_all(urls: list[str], timeout: int) -> list[Optional[requests.Response]]:
+    """GET urls concurrently; results keep the input order."""
+    if len(urls) <= 1:
+        return [_requests_get(u, timeout=timeout) for u in urls]
+    with ThreadPoolExecutor(max_workers=min(DISCOVERY_WORKERS, len(urls))) as pool:
+        return list(pool.map(lambda u: _requests_get(u, timeout=timeout), urls))
 
 
 def _response_text(resp: Optional[requests.Response]) -> str:
@@ -434,37 +699,43 @@ def decode_cfemail(cfhex: str) -> str:
         return ""
 
 
-def replace_cloudflare_emails(html: str) -> str:
-    """Replace Cloudflare email-protection placeholders like [email&#160;protected]."""
-    if not html or "email-protection" not in html:
-        return html
+def parse_page(html: str) -> tuple[str, Optional[lxml.html.HtmlElement]]:
+    """Parse a fetched page once, decoding Cloudflare emails in both the tree and the html."""
+    doc = _parse_html(html)
+    if doc is not None and "email-protection" in html and replace_cloudflare_emails_in_tree(doc):
+        html = lxml.html.tostring(doc, encoding="unicode")
+    return html, doc
 
-    soup = BeautifulSoup(html, "lxml")
 
-    # 1) <a class="__cf_email__" data-cfemail="...">[email&#160;protected]</a>
-    for a in soup.select("a.__cf_email__"):
-        cf = a.get("data-cfemail") or ""
-        email = decode_cfemail(cf)
-        if email:
-            a.string = email
-            a["href"] = f"mailto:{email}"
+def replace_cloudflare_emails_in_tree(doc: lxml.html.HtmlElement) -> bool:
+    """Replace Cloudflare email-protection placeholders like [email&#160;protected] in place.
 
+    Returns True if anything was replaced.
+    """
+    replaced = False
+    # 一次遍历同时覆盖两种形式：
+    # 1) <a class="__cf_email__" data-cfemail="...">[email&#160;protected]</a>
     # 2) href="/cdn-cgi/l/email-protection#...."
-    for a in soup.find_all("a", href=True):
-        href = a.get("href", "") or ""
-        m = re.search(r"/cdn-cgi/l/email-protection#([0-9a-fA-F]+)", href)
-        if m:
-            email = decode_cfemail(m.group(1))
-            if email:
-                a.string = email
-                a["href"] = f"mailto:{email}"
-
-    return str(soup)
+    for a in doc.xpath(_CFEMAIL_XPATH):
+        email = ""
+        if "__cf_email__" in (a.get("class") or "").split():
+            email = decode_cfemail(a.get("data-cfemail") or "")
+        if not email:
+            m = _CFEMAIL_HREF_RE.search(a.get("href") or "")
+            if m:
+                email = decode_cfemail(m.group(1))
+        if email:
+            for child in list(a):
+                a.remove(child)
+            a.text = email
+            a.set("href", f"mailto:{email}")
+            replaced = True
+    return replaced
 
 
 def _get_root_url(website: str) -> str:
     w = normalize_url(website)
-    p = urlparse(w)
+    p = _parse(w)
     if not p.scheme or not p.netloc:
         return w
     return f"{p.scheme}://{p.netloc}"
@@ -516,26 +787,45 @@ def _decompress_if_needed(url: str, resp: requests.Response) -> bytes:
     return content
 
 
+def _local_name(tag) -> str:
+    # 注释/处理指令的 tag 不是字符串
+    if not isinstance(tag, str):
+        return ""
+    return tag.rsplit("}", 1)[-1]
+
+
 def parse_sitemap_bytes(xml_bytes: bytes) -> tuple[list[str], list[str]]:
-    """Return (child_sitemaps, urls)."""
+    """Return (child_sitemaps, urls).
+
+    Streams <loc> entries with lxml.iterparse and frees each entry once read,
+    so 50k-URL sitemaps never materialize a full tree.
+    """
+    root_name = ""
+    locs: list[str] = []
     try:
-        soup = BeautifulSoup(xml_bytes, "xml")
-    except Exception:
-        return ([], [])
+        for event, el in etree.iterparse(
+            BytesIO(xml_bytes), events=("start", "end"), recover=True, huge_tree=True
+        ):
+            if event == "start":
+                if not root_name:
+                    root_name = _local_name(el.tag)
+                continue
+            name = _local_name(el.tag)
+            if name == "loc":
+                u = normalize_url((el.text or "").strip())
+                if u:
+                    locs.append(u)
+            elif name in ("url", "sitemap"):
+                el.clear()
+                parent = el.getparent()
+                while parent is not None and el.getprevious() is not None:
+                    del parent[0]
+    except etree.LxmlError:
+        pass
 
-    if soup.find("sitemapindex") is not None:
-        locs = [normalize_url(loc.get_text(strip=True)) for loc in soup.find_all("loc")]
-        locs = [u for u in locs if u]
+    if root_name == "sitemapindex":
         return (locs, [])
-
-    if soup.find("urlset") is not None:
-        locs = [normalize_url(loc.get_text(strip=True)) for loc in soup.find_all("loc")]
-        locs = [u for u in locs if u]
-        return ([], locs)
-
-    # fallback: try any <loc>
-    locs = [normalize_url(loc.get_text(strip=True)) for loc in soup.find_all("loc")]
-    locs = [u for u in locs if u]
+    # urlset，或任意含 <loc> 的 XML，均按页面 URL 处理
     return ([], locs)
 
 
@@ -545,44 +835,52 @@ def discover_urls_from_sitemaps(
     allowed_domain: str,
     same_domain_only: bool,
     limit: int,
-    allowed_langs: set[str],
+    allowed_langs: frozenset[str],
 ) -> list[str]:
     """Recursively parse sitemap index/urlset and return discovered page URLs."""
+    allowed = (allowed_domain or "").lower()
+    allowed_suffix = "." + allowed
     discovered: list[str] = []
     seen_sitemaps: set[str] = set()
     seen_urls: set[str] = set()
 
     q = deque(sitemap_urls)
     while q and len(discovered) < max(limit, 0):
-        sm = q.popleft()
-        if not sm or sm in seen_sitemaps:
-            continue
-        seen_sitemaps.add(sm)
+        # 每轮并发拉取队首的一批 sitemap，再按原顺序逐个解析
+        batch: list[str] = []
+        while q and len(batch) < DISCOVERY_WORKERS:
+            sm = q.popleft()
+            if not sm or sm in seen_sitemaps:
+                continue
+            seen_sitemaps.add(sm)
+            batch.append(sm)
 
-        resp = _requests_get(sm, timeout=40)
-        if not resp or resp.status_code != 200:
-            continue
+        for sm, resp in zip(batch, _fetch_all(batch, timeout=40)):
+            if len(discovered) >= limit:
+                break
+            if not resp or resp.status_code != 200:
+                continue
 
-        xml_bytes = _decompress_if_needed(sm, resp)
-        child_sitemaps, urls = parse_sitemap_bytes(xml_bytes)
+            xml_bytes = _decompress_if_needed(sm, resp)
+            child_sitemaps, urls = parse_sitemap_bytes(xml_bytes)
 
-        for child in child_sitemaps:
-            if child and child not in seen_sitemaps:
-                q.append(child)
+            for child in child_sitemaps:
+                if child and child not in seen_sitemaps:
+                    q.append(child)
 
-        for u in urls:
-            if not u:
-                continue
-            if same_domain_only and not is_same_domain(u, allowed_domain):
-                continue
-            if should_skip_url(u, allowed_langs):
-                continue
-            if u in seen_urls:
-                continue
-            seen_urls.add(u)
-            discovered.append(u)
-            if len(discovered) >= limit:
-                break
+            for u in urls:
+                if not u:
+                    continue
+                if same_domain_only and not _same_domain(u, allowed, allowed_suffix):
+                    continue
+                if should_skip_url(u, allowed_langs):
+                    continue
+                if u in seen_urls:
+                    continue
+                seen_urls.add(u)
+                discovered.append(u)
+                if len(discovered) >= limit:
+                    break
 
     return discovered
 
@@ -596,9 +894,9 @@ def discover_html_sitemap_urls(root_url: str) -> list[str]:
     ]
 
     out: list[str] = []
-    for c in candidates:
-        u = normalize_url(c)
-        resp = _requests_get(u, timeout=25)
+    urls = [normalize_url(c) for c in candidates]
+    # 候选路径并发探测，仍按候选顺序取第一个命中的
+    for u, resp in zip(urls, _fetch_all(urls, timeout=25)):
         if not resp or resp.status_code != 200:
             continue
         ct = (resp.headers.get("content-type") or "").lower()
@@ -609,7 +907,8 @@ def discover_html_sitemap_urls(root_url: str) -> list[str]:
         if not html.strip():
             continue
         # 如果页面看起来像 XML sitemap，就不在这里处理
-        if "<urlset" in html or "<sitemapindex" in html:
+        head = html[:SITEMAP_SNIFF_BYTES].lower()
+        if "<urlset" in head or "<sitemapindex" in head:
             continue
         for link in extract_links(html, u):
             out.append(link)
@@ -628,6 +927,14 @@ def discover_html_sitemap_urls(root_url: str) -> list[str]:
     return dedup
 
 
+# 按 local-name 匹配，RSS 2.0 / RSS 1.0 (RDF) / Atom 都能覆盖
+_FEED_LINKS_XPATH = (
+    "//*[local-name()='item']/*[local-name()='link']/text()"
+    " | //*[local-name()='entry']/*[local-name()='link'][not(@rel) or @rel='alternate']/@href"
+)
+_FEED_PARSER = etree.XMLParser(recover=True, resolve_entities=False, no_network=True)
+
+
 def discover_feed_urls(root_url: str) -> list[str]:
     candidates = [
         root_url.rstrip("/") + "/feed",
@@ -638,27 +945,25 @@ def discover_feed_urls(root_url: str) -> list[str]:
     ]
 
     out: list[str] = []
-    for c in candidates:
-        u = normalize_url(c)
-        resp = _requests_get(u, timeout=25)
+    urls = [normalize_url(c) for c in candidates]
+    for u, resp in zip(urls, _fetch_all(urls, timeout=25)):
         if not resp or resp.status_code != 200:
             continue
-        data = resp.content or b""
-        # feed 通常是 xml
+        if not resp.content:
+            continue
+        # feed 通常是 xml；解析失败或解析不出根节点的（空文档等）直接跳过
         try:
-            soup = BeautifulSoup(data, "xml")
-        except Exception:
+            root = etree.fromstring(resp.content, _FEED_PARSER)
+        except etree.LxmlError:
+            continue
+        if root is None:
             continue
 
-        # RSS <item><link> or Atom <entry><link href="...">
-        for tag in soup.find_all("link"):
-            href = tag.get("href")
-            if href:
-                out.append(normalize_url(href))
-            else:
-                txt = tag.get_text(strip=True)
-                if txt:
-                    out.append(normalize_url(txt))
+        # RSS <item><link>text</link> or Atom <entry><link href="...">
+        for link in root.xpath(_FEED_LINKS_XPATH):
+            link = str(link).strip()
+            if link:
+                out.append(normalize_url(urljoin(u, link)))
 
         if out:
             break
@@ -676,20 +981,13 @@ def discover_feed_urls(root_url: str) -> list[str]:
 def looks_js_heavy(html: str) -> bool:
     if not html:
         return True
-    h = html.lower()
-    # 常见的 SPA/SSR 痕迹
-    if "id=\"__next\"" in h or "__next_data__" in h:
+    # 常见的 SPA/SSR 痕迹（忽略大小写匹配，避免对整页做 lower() 拷贝）
+    if _JS_HEAVY_RE.search(html):
         return True
-    if "window.__nuxt__" in h or "id=\"__nuxt\"" in h:
-        return True
-    if "data-reactroot" in h:
-        return True
-    if "enable javascript" in h or "requires javascript" in h:
-        return True
-    if "<noscript" in h and len(h) < 20000:
+    if len(html) < 20000 and _NOSCRIPT_RE.search(html):
         return True
     # 超短且脚本很多
-    if len(h) < 8000 and h.count("<script") >= 3:
+    if len(html) < 8000 and sum(1 for _ in islice(_SCRIPT_TAG_RE.finditer(html), 3)) >= 3:
         return True
     return False
 
@@ -700,11 +998,13 @@ def discover_initial_queue(
     seeds: list[str],
     max_pages: int,
     same_domain_only: bool,
-    allowed_langs: set[str],
+    allowed_langs: frozenset[str],
 ) -> list[str]:
     """优先级：robots.txt sitemap -> 常见 sitemap -> HTML sitemap -> feed -> seeds"""
     root_url = _get_root_url(website)
-    base_domain = urlparse(normalize_url(website)).netloc
+    # 站点域名在整次发现过程中不变：小写和 "." 后缀只算一次，逐个 URL 只做比较
+    base_domain = _parse(normalize_url(website)).netloc.lower()
+    base_suffix = "." + base_domain
 
     sitemap_urls = discover_sitemaps_from_robots(root_url)
 
@@ -718,14 +1018,13 @@ def discover_initial_queue(
             root_url.rstrip("/") + "/sitemap/sitemap.xml",
             root_url.rstrip("/") + "/sitemaps/sitemap.xml",
         ]
-        for c in common:
-            u = normalize_url(c)
-            resp = _requests_get(u, timeout=25)
+        common_urls = [normalize_url(c) for c in common]
+        for u, resp in zip(common_urls, _fetch_all(common_urls, timeout=25)):
             if not resp or resp.status_code != 200:
                 continue
-            # 简单判断一下像 sitemap
-            txt = (_response_text(resp) or "").lower()
-            if "<urlset" in txt or "<sitemapindex" in txt or u.lower().endswith(".gz"):
+            # 简单判断一下像 sitemap：根标签总在开头，只看前 2KB，不对整个响应体做 lower()
+            head = (resp.content or b"")[:SITEMAP_SNIFF_BYTES].lower()
+            if b"<urlset" in head or b"<sitemapindex" in head or u.lower().endswith(".gz"):
                 sitemap_urls.append(u)
                 break
 
@@ -756,7 +1055,7 @@ def discover_initial_queue(
     for u in discovered_urls:
         if not u:
             continue
-        if same_domain_only and not is_same_domain(u, base_domain):
+        if same_domain_only and not _same_domain(u, base_domain, base_suffix):
             continue
         if should_skip_url(u, allowed_langs):
             continue
@@ -769,7 +1068,7 @@ def discover_initial_queue(
         u = normalize_url(s)
         if not u:
             continue
-        if same_domain_only and not is_same_domain(u, base_domain):
+        if same_domain_only and not _same_domain(u, base_domain, base_suffix):
             continue
         if should_skip_url(u, allowed_langs):
             continue
@@ -794,29 +1093,38 @@ def _strip_region_prefix(path: str) -> str:
     return "/" + "/".join(segs)
 
 
-def bucket_url(url: str) -> str:
-    """Coarse bucket for crawl budgeting."""
+@lru_cache(maxsize=65536)
+def _crawl_path(url: str) -> Optional[str]:
+    """Lowercased path without the region prefix, shared by bucket_url/score_url; None if unparsable."""
     try:
-        p = urlparse(url)
+        p = _parse(url)
     except Exception:
+        return None
+    return _strip_region_prefix((p.path or "").lower())
+
+
+# bucket_url 的分类规则，按优先级排列；每条一个预编译正则（路径前缀或中间的目录段）
+_BUCKET_RULES = (
+    ("blog", re.compile(r"^/blog|/blog/")),
+    ("resources", re.compile(r"^/resource|/resources/")),
+    ("news", re.compile(r"^/news|/news/")),
+    ("press", re.compile(r"^/press|/press/")),
+    ("events", re.compile(r"^/event|/events/")),
+    ("customers", re.compile(r"^/customer|/customers/")),
+    ("cases", re.compile(r"^/case|/case/|^/stories|/stories/")),
+)
+
+
+@lru_cache(maxsize=65536)
+def bucket_url(url: str) -> str:
+    """Coarse bucket for crawl budgeting."""
+    path = _crawl_path(url)
+    if path is None:
         return "other"
-    path = _strip_region_prefix((p.path or "").lower())
-
-    if path.startswith("/blog") or "/blog/" in path:
-        return "blog"
-    if path.startswith("/resources") or "/resources/" in path or path.startswith("/resource"):
-        return "resources"
-    if path.startswith("/news") or "/news/" in path:
-        return "news"
-    if path.startswith("/press") or "/press/" in path:
-        return "press"
-    if path.startswith("/events") or "/events/" in path or path.startswith("/event"):
-        return "events"
-    if path.startswith("/customers") or "/customers/" in path or path.startswith("/customer"):
-        return "customers"
-    if path.startswith("/case") or "/case/" in path or path.startswith("/stories") or "/stories/" in path:
-        return "cases"
 
+    for bucket, pattern in _BUCKET_RULES:
+        if pattern.search(path):
+            return bucket
     return "other"
 
 
@@ -837,54 +1145,57 @@ def default_bucket_caps(max_pages: int) -> dict[str, int]:
     }
 
 
+# score_url 的加分/减分路径关键词
+HIGH_VALUE_PATHS = (
+    "/products",
+    "/product",
+    "/platform",
+    "/pricing",
+    "/about",
+    "/company",
+    "/solutions",
+    "/solution",
+    "/customers",
+    "/customer",
+    "/contact",
+    "/security",
+    "/trust",
+    "/compliance",
+    "/docs",
+    "/documentation",
+)
+
+LOW_VALUE_PATHS = (
+    "/blog",
+    "/news",
+    "/press",
+    "/events",
+    "/resources",
+    "/resource",
+    "/tag/",
+    "/category/",
+    "/author/",
+)
+
+_HIGH_VALUE_RE = re.compile("|".join(re.escape(x) for x in HIGH_VALUE_PATHS))
+_LOW_VALUE_RE = re.compile("|".join(re.escape(x) for x in LOW_VALUE_PATHS))
+
+
+@lru_cache(maxsize=65536)
 def score_url(url: str) -> int:
     """Priority score for crawling: higher = crawl earlier."""
-    try:
-        p = urlparse(url)
-    except Exception:
+    path = _crawl_path(url)
+    if path is None:
         return -999
 
-    path = _strip_region_prefix((p.path or "").lower())
-
-    high = (
-        "/products",
-        "/product",
-        "/platform",
-        "/pricing",
-        "/about",
-        "/company",
-        "/solutions",
-        "/solution",
-        "/customers",
-        "/customer",
-        "/contact",
-        "/security",
-        "/trust",
-        "/compliance",
-        "/docs",
-        "/documentation",
-    )
-
-    low = (
-        "/blog",
-        "/news",
-        "/press",
-        "/events",
-        "/resources",
-        "/resource",
-        "/tag/",
-        "/category/",
-        "/author/",
-    )
-
     s = 0
-    if any(h in path for h in high):
+    if _HIGH_VALUE_RE.search(path):
         s += 80
-    if any(l in path for l in low):
+    if _LOW_VALUE_RE.search(path):
         s -= 60
 
     # Prefer shorter, cleaner URLs
-    if p.query:
+    if _parse(url).query:
         s -= 12
     depth = len([x for x in path.split("/") if x])
     s -= max(0, depth - 4) * 2
@@ -892,6 +1203,57 @@ def score_url(url: str) -> int:
     return s
 
 
+@lru_cache(maxsize=1)
+def get_browser():
+    """Launch headless Chromium once per process; closed automatically at exit."""
+    from playwright.sync_api import sync_playwright  # type: ignore
+
+    pw = sync_playwright().start()
+    try:
+        browser = pw.chromium.launch(headless=True)
+    except Exception:
+        pw.stop()
+        raise
+    atexit.register(_close_browser, pw, browser)
+    return browser
+
+
+def _close_browser(pw, browser) -> None:
+    try:
+        browser.close()
+    except Exception:
+        pass
+    try:
+        pw.stop()
+    except Exception:
+        pass
+
+
+# Playwright 渲染时直接拦截的资源类型
+JS_BLOCKED_RESOURCE_TYPES = frozenset({"image", "media", "font", "stylesheet"})
+
+
+def _route_skip_assets(route) -> None:
+    if route.request.resource_type in JS_BLOCKED_RESOURCE_TYPES:
+        route.abort()
+    else:
+        route.continue_()
+
+
+def clear_url_caches() -> None:
+    """Drop the per-URL memo caches (they only pay off within one crawl)."""
+    for fn in (
+        _parse,
+        _crawl_path,
+        extract_lang_from_url,
+        normalize_url,
+        get_skip_reason,
+        bucket_url,
+        score_url,
+    ):
+        fn.cache_clear()
+
+
 def crawl_site(
     slug: str,
     name: str,
@@ -905,18 +1267,21 @@ def crawl_site(
     js_only: bool,
     js_wait_until: str,
     js_timeout_ms: int,
-    allowed_langs: set[str],
+    allowed_langs: frozenset[str],
+    keep_raw: bool = False,
 ) -> dict:
     company_dir = COMPANIES_DIR / slug
     raw_dir = company_dir / "raw" / "pages"
     extracted_dir = company_dir / "extracted"
     rag_dir = company_dir / "rag"
 
-    raw_dir.mkdir(parents=True, exist_ok=True)
+    if keep_raw:
+        raw_dir.mkdir(parents=True, exist_ok=True)
     extracted_dir.mkdir(parents=True, exist_ok=True)
     rag_dir.mkdir(parents=True, exist_ok=True)
 
-    base_domain = urlparse(normalize_url(website)).netloc
+    base_domain = _parse(normalize_url(website)).netloc.lower()
+    base_suffix = "." + base_domain
 
     initial_urls = discover_initial_queue(
         website=website,
@@ -927,10 +1292,41 @@ def crawl_site(
     )
 
     # Use a priority frontier so low-value sections (e.g., /blog) can't swallow the entire budget.
-    heap: list[tuple[int, int, str]] = []
-    seq = 0
+    # 每个 bucket 一个分级队列（score -> FIFO deque）：score_url 只产出少量整数分值，
+    # 入队/出队都是 O(1)；bucket 触顶后整组丢弃，不再逐个弹出再跳过
+    frontiers: dict[str, dict[int, deque[tuple[int, str]]]] = {}
+    seq = count()
     enqueued: set[str] = set()
 
+    def _push(u: str) -> None:
+        levels = frontiers.setdefault(bucket_url(u), {})
+        score = score_url(u)
+        q = levels.get(score)
+        if q is None:
+            q = levels[score] = deque()
+        # 同分值内按发现顺序；seq 只用于跨 bucket 同分时决定先后
+        q.append((next(seq), u))
+
+    def _pop() -> Optional[str]:
+        # bucket 和分值档位都很少，逐个比较各 bucket 的最高档队首即可保持全局按分数出队
+        best: Optional[dict[int, deque[tuple[int, str]]]] = None
+        best_key = (0, 0)
+        for levels in frontiers.values():
+            if not levels:
+                continue
+            top = max(levels)
+            key = (-top, levels[top][0][0])
+            if best is None or key < best_key:
+                best, best_key = levels, key
+        if best is None:
+            return None
+        top = -best_key[0]
+        q = best[top]
+        url = q.popleft()[1]
+        if not q:
+            del best[top]
+        return url
+
     diag_counts: dict[str, int] = {
         "initial_urls": 0,
         "discovered_links": 0,
@@ -947,6 +1343,7 @@ def crawl_site(
         "skipped_cross_domain": 0,
         "skipped_policy": 0,
         "skipped_bucket_cap": 0,
+        "raw_deduped": 0,
     }
 
     skipped_samples: dict[str, list[str]] = {}
@@ -965,7 +1362,7 @@ def crawl_site(
         nu = normalize_url(u)
         if not nu:
             continue
-        if same_domain_only and not is_same_domain(nu, base_domain):
+        if same_domain_only and not _same_domain(nu, base_domain, base_suffix):
             diag_counts["skipped_cross_domain"] += 1
             continue
         r = get_skip_reason(nu, allowed_langs)
@@ -977,38 +1374,51 @@ def crawl_site(
             continue
         enqueued.add(nu)
         diag_counts["enqueued"] += 1
-        # heapq is min-heap; use negative score for max behavior
-        heapq.heappush(heap, (-score_url(nu), seq, nu))
-        seq += 1
+        _push(nu)
 
     bucket_caps = default_bucket_caps(max_pages)
     bucket_counts: dict[str, int] = {k: 0 for k in bucket_caps.keys()}
 
     visited: set[str] = set()
     pages_meta: list[dict] = []
+    raw_by_hash: dict[str, str] = {}
     extracted_count = 0
 
-    # JS 渲染兜底（可选）
-    pw = None
-    browser = None
+    # JS 渲染兜底（可选）：浏览器进程全局复用，每次爬取只开独立的 context/page
+    context = None
     page = None
 
     js_available = False
     if js_fallback or js_only:
         try:
-            from playwright.sync_api import sync_playwright  # type: ignore
-
-            pw = sync_playwright().start()
-            browser = pw.chromium.launch(headless=True)
-            page = browser.new_page(user_agent=USER_AGENT)
+            context = get_browser().new_context(user_agent=USER_AGENT)
+            page = context.new_page()
+            # 只需要渲染后的 DOM：图片/字体/样式/媒体一律不下载
+            page.route("**/*", _route_skip_assets)
+            page.set_default_navigation_timeout(js_timeout_ms)
             js_available = True
         except Exception:
             js_available = False
-            pw = None
-            browser = None
+            context = None
             page = None
 
+    # 按域名限速：每个 netloc 相邻两次请求至少间隔 sleep_seconds（线程间预约时间槽）
+    next_slot: dict[str, float] = {}
+    slot_lock = threading.Lock()
+
+    def _polite_wait(url: str) -> None:
+        if sleep_seconds <= 0:
+            return
+        netloc = _parse(url).netloc
+        with slot_lock:
+            now = time.monotonic()
+            start = max(now, next_slot.get(netloc, now))
+            next_slot[netloc] = start + sleep_seconds
+        if start > now:
+            time.sleep(start - now)
+
     def fetch_html_requests(url: str) -> Optional[str]:
+        _polite_wait(url)
         resp = _requests_get(url, timeout=30)
         if not resp:
             return None
@@ -1020,8 +1430,6 @@ def crawl_site(
             return None
 
         html = _response_text(resp) or ""
-        html = replace_cloudflare_emails(html)
-
         if not html.strip():
             return None
 
@@ -1035,17 +1443,35 @@ def crawl_site(
     def fetch_html_js(url: str) -> Optional[str]:
         if not js_available or page is None:
             return None
+        _polite_wait(url)
         try:
-            page.goto(url, wait_until=js_wait_until, timeout=js_timeout_ms)
-            html = page.content() or ""
-            html = replace_cloudflare_emails(html)
-            return html
+            if js_wait_until != "networkidle":
+                page.goto(url, wait_until=js_wait_until, timeout=js_timeout_ms)
+                return page.content() or ""
+
+            # 分级等待：先到 domcontentloaded；正文已足够就不再等网络空闲（最慢的一档）
+            page.goto(url, wait_until="domcontentloaded", timeout=js_timeout_ms)
+            try:
+                body_text = page.inner_text("body", timeout=1000)
+            except Exception:
+                body_text = ""
+            if len(body_text.strip()) < max(50, min_chars):
+                try:
+                    page.wait_for_load_state("networkidle", timeout=js_timeout_ms)
+                except Exception:
+                    # 网络一直不空闲（长轮询等）时用已渲染的内容
+                    pass
+            return page.content() or ""
         except Exception:
             return None
 
-    try:
-        while heap and len(pages_meta) < max_pages:
-            url = normalize_url(heapq.heappop(heap)[2])
+    def _next_url() -> Optional[str]:
+        """Pop the next fetchable URL and charge it to its bucket; None when exhausted."""
+        while True:
+            popped = _pop()
+            if popped is None:
+                return None
+            url = normalize_url(popped)
             diag_counts["popped"] += 1
             if not url:
                 _add_skip("bad_url", url)
@@ -1053,7 +1479,7 @@ def crawl_site(
             if url in visited:
                 diag_counts["skipped_duplicate"] += 1
                 continue
-            if same_domain_only and not is_same_domain(url, base_domain):
+            if same_domain_only and not _same_domain(url, base_domain, base_suffix):
                 diag_counts["skipped_cross_domain"] += 1
                 continue
             r = get_skip_reason(url, allowed_langs)
@@ -1062,148 +1488,170 @@ def crawl_site(
                 continue
 
             b = bucket_url(url)
-            cap = bucket_caps.get(b, max_pages)
-            if bucket_counts.get(b, 0) >= cap and b != "other":
-                diag_counts["skipped_bucket_cap"] += 1
-                continue
-
             visited.add(url)
             diag_counts["visited"] += 1
             # count toward bucket budget once we decide to fetch
-            b = bucket_url(url)
             bucket_counts[b] = bucket_counts.get(b, 0) + 1
+            if b != "other" and bucket_counts[b] >= bucket_caps.get(b, max_pages):
+                # bucket 已满：剩余候选一次性丢弃
+                diag_counts["skipped_bucket_cap"] += sum(len(q) for q in frontiers.pop(b, {}).values())
+            return url
 
-            rendered = False
-            html = None
+    # requests 抓取交给线程池并发；抽取/入队仍在主线程按出队顺序处理，共享状态无需加锁
+    pool = ThreadPoolExecutor(max_workers=FETCH_WORKERS)
+
+    try:
+        while len(pages_meta) < max_pages:
+            batch: list[str] = []
+            while len(batch) < min(FETCH_WORKERS, max_pages - len(pages_meta)):
+                url = _next_url()
+                if url is None:
+                    break
+                batch.append(url)
+            if not batch:
+                break
 
             if js_only:
-                html = fetch_html_js(url)
-                rendered = bool(html)
+                # Playwright 同步 API 绑定当前线程：逐个渲染
+                results = map(fetch_html_js, batch)
+            else:
+                results = pool.map(fetch_html_requests, batch)
+
+            for url, html in zip(batch, results):
+                rendered = bool(html) if js_only else False
                 if rendered:
                     diag_counts["rendered_js"] += 1
-            else:
-                html = fetch_html_requests(url)
-                rendered = False  # keep explicit
 
-            if html is not None:
-                diag_counts["fetched_html"] += 1
-            else:
-                diag_counts["fetched_failed"] += 1
+                if html is not None:
+                    diag_counts["fetched_html"] += 1
+                else:
+                    diag_counts["fetched_failed"] += 1
+
+                if html is None:
+                    # requests 失败：尝试 js
+                    if js_fallback:
+                        js_html = fetch_html_js(url)
+                        if js_html:
+                            html = js_html
+                            rendered = True
+                            diag_counts["rendered_js"] += 1
+                    if html is None:
+                        continue
 
-            if html is None:
-                # requests 失败：尝试 js
-                if js_fallback:
+                # 每个版本的 html 只解析一次：Cloudflare 邮箱替换、标题、链接共用同一棵树
+                html, doc = parse_page(html)
+
+                # 先抽取一次
+                text = extract(html, url=url) or ""
+                if text.strip():
+                    diag_counts["extracted_ok"] += 1
+
+                # JS 兜底：当文本很少且页面看起来像 SPA/JS-heavy 时，再渲染抓取
+                if (
+                    not js_only
+                    and js_fallback
+                    and js_available
+                    and (len((text or "").strip()) < max(50, min_chars // 2))
+                    and looks_js_heavy(html)
+                ):
                     js_html = fetch_html_js(url)
                     if js_html:
-                        html = js_html
+                        html, doc = parse_page(js_html)
                         rendered = True
                         diag_counts["rendered_js"] += 1
-                if html is None:
-                    continue
-
-            # 先抽取一次
-            text = extract(html, url=url) or ""
-            if text.strip():
-                diag_counts["extracted_ok"] += 1
-
-            # JS 兜底：当文本很少且页面看起来像 SPA/JS-heavy 时，再渲染抓取
-            if (
-                not js_only
-                and js_fallback
-                and js_available
-                and (len((text or "").strip()) < max(50, min_chars // 2))
-                and looks_js_heavy(html)
-            ):
-                js_html = fetch_html_js(url)
-                if js_html:
-                    html = js_html
-                    rendered = True
-                    diag_counts["rendered_js"] += 1
-                    text = extract(html, url=url) or ""
-
-            title = extract_title(html)
-
-            page_id = len(pages_meta) + 1
-            raw_filename = f"{page_id:03d}.html"
-            text_filename = f"{page_id:03d}.txt"
-
-            raw_path = raw_dir / raw_filename
-            raw_path.write_text(html, encoding="utf-8")
-
-            cleaned_text = (text or "").strip()
-
-            # 语言兜底：若页面正文包含日文假名或韩文 Hangul，直接不入库（避免 Geo/IP/地区路由污染）
-            if cleaned_text and re.search(r"[\u3040-\u30ff\uac00-\ud7af]", cleaned_text):
-                cleaned_text = ""
-
-            if cleaned_text and len(cleaned_text) >= max(0, min_chars):
-                extracted_count += 1
-                diag_counts["stored_ok"] += 1
-                text_path = extracted_dir / text_filename
-                save_text(text_path, cleaned_text)
-                text_file = f"extracted/{text_filename}"
-            else:
-                diag_counts["stored_too_short"] += 1
-                cleaned_text = ""
-                text_file = ""
-
-            pages_meta.append(
-                {
-                    "id": page_id,
-                    "url": url,
-                    "raw_file": f"raw/pages/{raw_filename}",
-                    "text_file": text_file,
-                    "title": title,
-                    "text": cleaned_text,
-                    "rendered": rendered,
-                }
-            )
-            if len(fetched_samples) < 50:
-                fetched_samples.append(url)
-
-            # BFS 扩展链接：用最终 html（若渲染则包含动态链接）
-            if len(pages_meta) < max_pages:
-                for link in extract_links(html, url):
-                    diag_counts["discovered_links"] += 1
-                    if same_domain_only and not is_same_domain(link, base_domain):
-                        diag_counts["skipped_cross_domain"] += 1
-                        continue
-                    r = get_skip_reason(link, allowed_langs)
-                    if r:
-                        _add_skip(r, link)
-                        continue
-                    if link in visited or link in enqueued:
-                        diag_counts["skipped_duplicate"] += 1
-                        continue
-
-                    # Apply bucket caps early: still allow a few, but don't flood the frontier
-                    lb = bucket_url(link)
-                    if lb != "other" and bucket_counts.get(lb, 0) >= bucket_caps.get(lb, max_pages):
-                        diag_counts["skipped_bucket_cap"] += 1
-                        continue
-
-                    enqueued.add(link)
-                    diag_counts["enqueued"] += 1
-                    heapq.heappush(heap, (-score_url(link), seq, link))
-                    seq += 1
-
-            time.sleep(max(sleep_seconds, 0))
+                        text = extract(html, url=url) or ""
+
+                title = extract_title_from_tree(doc) if doc is not None else ""
+
+                page_id = len(pages_meta) + 1
+                raw_filename = f"{page_id:03d}.html"
+                text_filename = f"{page_id:03d}.txt"
+
+                # 原始 HTML 下游不读取，只在 --keep-raw 时落盘；
+                # 内容完全相同的页面（软 404、重定向到同一页等）只落盘一份，其余指向它
+                raw_file = ""
+                if keep_raw:
+                    raw_hash = _content_hash(html)
+                    raw_file = raw_by_hash.get(raw_hash, "")
+                    if not raw_file:
+                        raw_file = f"raw/pages/{raw_filename}"
+                        (raw_dir / raw_filename).write_text(html, encoding="utf-8")
+                        raw_by_hash[raw_hash] = raw_file
+                    else:
+                        diag_counts["raw_deduped"] += 1
+
+                cleaned_text = (text or "").strip()
+
+                # 语言兜底：若页面正文包含日文假名或韩文 Hangul，直接不入库（避免 Geo/IP/地区路由污染）
+                # 先做 O(1) 的长度判断，过短的正文本来就不入库，不必再扫描全文
+                if (
+                    cleaned_text
+                    and len(cleaned_text) >= max(0, min_chars)
+                    and not has_jp_kr(cleaned_text)
+                ):
+                    extracted_count += 1
+                    diag_counts["stored_ok"] += 1
+                    text_path = extracted_dir / text_filename
+                    save_text(text_path, cleaned_text)
+                    text_file = f"extracted/{text_filename}"
+                else:
+                    diag_counts["stored_too_short"] += 1
+                    cleaned_text = ""
+                    text_file = ""
+
+                pages_meta.append(
+                    {
+                        "id": page_id,
+                        "url": url,
+                        "raw_file": raw_file,
+                        "text_file": text_file,
+                        "title": title,
+                        "text": cleaned_text,
+                        "rendered": rendered,
+                    }
+                )
+                if len(fetched_samples) < 50:
+                    fetched_samples.append(url)
+
+                # BFS 扩展链接：用最终 html（若渲染则包含动态链接）
+                if len(pages_meta) < max_pages and doc is not None:
+                    links = list(extract_links_from_tree(doc, url))
+                    diag_counts["discovered_links"] += len(links)
+                    # 重复链接最常见：先整体去掉页内重复和已入队的，再逐个做域名/策略检查。
+                    # visited 都来自 enqueued，所以只需减去 enqueued；dict.fromkeys 保持页面顺序
+                    new_links = [link for link in dict.fromkeys(links) if link not in enqueued]
+                    diag_counts["skipped_duplicate"] += len(links) - len(new_links)
+                    for link in new_links:
+                        if same_domain_only and not _same_domain(link, base_domain, base_suffix):
+                            diag_counts["skipped_cross_domain"] += 1
+                            continue
+                        r = get_skip_reason(link, allowed_langs)
+                        if r:
+                            _add_skip(r, link)
+                            continue
+
+                        # Apply bucket caps early: still allow a few, but don't flood the frontier
+                        lb = bucket_url(link)
+                        if lb != "other" and bucket_counts.get(lb, 0) >= bucket_caps.get(lb, max_pages):
+                            diag_counts["skipped_bucket_cap"] += 1
+                            continue
+
+                        enqueued.add(link)
+                        diag_counts["enqueued"] += 1
+                        _push(link)
 
     finally:
-        # 关闭 playwright
+        pool.shutdown(wait=False, cancel_futures=True)
+        _SESSION.close()
+        # 关闭本次的 page/context；浏览器本身留给后续爬取，退出时由 atexit 关闭
         try:
             if page is not None:
                 page.close()
         except Exception:
             pass
         try:
-            if browser is not None:
-                browser.close()
-        except Exception:
-            pass
-        try:
-            if pw is not None:
-                pw.stop()
+            if context is not None:
+                context.close()
         except Exception:
             pass
 
@@ -1226,10 +1674,9 @@ def crawl_site(
         ],
     }
 
-    (company_dir / "sources_meta.json").write_text(
-        json.dumps(sources_meta, ensure_ascii=False, indent=2),
-        encoding="utf-8",
-    )
+    (company_dir / "sources_meta.json").write_bytes(json_dumps_bytes(sources_meta))
+    if keep_raw:
+        (raw_dir / "hashes.json").write_bytes(json_dumps_bytes(raw_by_hash))
 
     build_sources_md(company_dir, name, website, fetched_at, pages_meta)
 
@@ -1245,10 +1692,7 @@ def crawl_site(
             "fetched_samples": fetched_samples,
             "skipped_samples": skipped_samples,
         }
-        (company_dir / "crawl_debug.json").write_text(
-            json.dumps(debug, ensure_ascii=False, indent=2),
-            encoding="utf-8",
-        )
+        (company_dir / "crawl_debug.json").write_bytes(json_dumps_bytes(debug))
     except Exception:
         pass
 
@@ -1260,61 +1704,205 @@ def crawl_site(
     }
 
 
+FAQ_QUESTIONS = [
+    "你们是做什么的？",
+    "公司能帮助客户什么/解决什么问题？",
+    "主要产品/服务有哪些？",
+    "典型客户/行业？",
+    "典型使用场景/案例？",
+    "如何联系（邮箱/电话/地址/表单）？",
+    "定价/试用（若无写“未提及”）？",
+    "合规/安全（若无写“未提及”）？",
+]
+FAQ_SYSTEM_PROMPT = "你是公司官网资料整理员，要求简洁、结构化，不能编造。"
+FAQ_FALLBACK_ANSWER = "未提及/不确定。"
+# 批量生成时合并上下文的最大片段数（各问题按排名轮流取，去重）
+FAQ_BATCH_MAX_CHUNKS = 24
+# 批量生成一次请求的超时上限（秒）；超时后逐题补问
+FAQ_BATCH_TIMEOUT = 300
+
+# FAQ 检索结果缓存文件（位于 companies/<slug>/rag/）
+FAQ_RETRIEVAL_CACHE = "faq_retrieval.json"
+
+# FAQ 生成对 Ollama 的请求复用同一组 keep-alive 连接
+_OLLAMA_SESSION = requests.Session()
+_OLLAMA_SESSION.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=8))
+_OLLAMA_SESSION.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=8))
+
+_CITE_RE = re.compile(r"\[(\d+)\]")
+
+
+def _faq_chat(
+    base_url: str, model: str, prompt: str, json_mode: bool = False, timeout: int = 120
+) -> str:
+    payload = {
+        "model": model,
+        "messages": [
+            {"role": "system", "content": FAQ_SYSTEM_PROMPT},
+            {"role": "user", "content": prompt},
+        ],
+        "stream": False,
+    }
+    if json_mode:
+        payload["format"] = "json"
+    try:
+        response = _OLLAMA_SESSION.post(
+            f"{base_url}/api/chat",
+            json=payload,
+            timeout=timeout,
+        )
+        if response.status_code == 200:
+            data = response.json()
+            return data.get("message", {}).get("content", "").strip()
+    except (requests.RequestException, ValueError):
+        pass
+    return ""
+
+
+def _faq_answer_single(base_url: str, model: str, question: str, sources: list[dict]) -> str:
+    context = "\n".join(f"[{item['idx']}] {item['text']}" for item in sources)
+    prompt = (
+        "请基于资料回答问题，若资料未提及请回答“未提及/不确定”。\n"
+        "答案需要带来源编号，如 [1] 或 [1][3]。\n\n"
+        f"资料:\n{context}\n\n"
+        f"问题: {question}\n"
+    )
+    return _faq_chat(base_url, model, prompt) or FAQ_FALLBACK_ANSWER
+
+
+def _faq_item_answer(item: dict) -> str:
+    # 只接受字符串答案；null、列表、对象等当作缺失，交给逐题补问
+    answer = item.get("answer")
+    return answer.strip() if isinstance(answer, str) else ""
+
+
+def _faq_answer_batch(
+    base_url: str, model: str, questions: list[str], retrieved: list[list[dict]], max_chunks: int
+) -> dict[int, tuple[str, list[dict]]]:
+    """Answer all questions with one JSON-mode chat call.
+
+    Returns {question index: (answer_md, sources)} for the answers that came back; the
+    answer's citations are renumbered to positions in its own sources list.
+    """
+    # 合并上下文：各问题按排名轮流取片段，按 chunk_id 去重后统一编号
+    shared: list[dict] = []
+    number_of: dict[str, int] = {}
+    for rank in range(max((len(r) for r in retrieved), default=0)):
+        for sources in retrieved:
+            if rank < len(sources) and len(shared) < max_chunks:
+                src = sources[rank]
+                if src["chunk_id"] not in number_of:
+                    shared.append(src)
+                    number_of[src["chunk_id"]] = len(shared)
+    if not shared:
+        return {}
+
+    context = "\n".join(f"[{n}] {src['text']}" for n, src in enumerate(shared, start=1))
+    listing = "\n".join(f"- q{i}: {q}" for i, q in enumerate(questions, start=1))
+    prompt = (
+        "请基于资料逐一回答下列问题，若资料未提及请回答“未提及/不确定”。\n"
+        "每个答案需要带来源编号，如 [1] 或 [1][3]，编号对应下方资料。\n"
+        '只输出 JSON，格式：{"items": [{"id": "q1", "answer": "..."}]}\n\n'
+        f"资料:\n{context}\n\n"
+        f"问题:\n{listing}\n"
+    )
+
+    try:
+        # 一次生成全部答案，超时放宽但有上限
+        timeout = min(120 * len(questions), FAQ_BATCH_TIMEOUT)
+        raw = _faq_chat(base_url, model, prompt, json_mode=True, timeout=timeout)
+        data = json.loads(raw or "{}")
+        items = data.get("items") or []
+        if not isinstance(items, list):
+            return {}
+        items = [item for item in items if isinstance(item, dict)]
+        answers = {
+            str(item.get("id", "")).strip().lower(): _faq_item_answer(item)
+            for item in items
+        }
+    except (ValueError, AttributeError, TypeError):
+        return {}
+
+    ids = [f"q{i}" for i in range(1, len(questions) + 1)]
+    if not answers.keys() & set(ids) and len(items) == len(questions):
+        # 模型没按 qN 填 id 但条数对得上：按位置对应，不浪费这次批量生成
+        answers = {qid: _faq_item_answer(item) for qid, item in zip(ids, items)}
+
+    out: dict[int, tuple[str, list[dict]]] = {}
+    for i, sources in enumerate(retrieved):
+        answer = answers.get(ids[i], "")
+        if not answer:
+            continue
+        # 全局编号 -> 本问题 sources 中的位置；引用了本问题之外的片段则追加到末尾
+        item_sources = list(sources)
+        local_of = {src["chunk_id"]: n for n, src in enumerate(item_sources, start=1)}
+
+        def _renumber(m: re.Match) -> str:
+            n = int(m.group(1))
+            if not 1 <= n <= len(shared):
+                return m.group(0)
+            src = shared[n - 1]
+            if src["chunk_id"] not in local_of:
+                item_sources.append(src)
+                local_of[src["chunk_id"]] = len(item_sources)
+            return f"[{local_of[src['chunk_id']]}]"
+
+        out[i] = (_CITE_RE.sub(_renumber, answer), item_sources)
+    return out
+
+
+def _faq_retrieve(slug: str, questions: list[str], top_k: int, config: dict) -> list[list[dict]]:
+    """retrieve_many() for the FAQ questions, cached on disk until the index or embed model changes."""
+    from app.rag import get_company_dir, get_embed_model, load_index, retrieve_many
+
+    # 只重跑 FAQ（rebuild_faq_all）时索引通常没变：直接复用上次的检索结果，省掉查询向量化
+    key = {
+        "version": list(load_index(slug)["version"]),
+        "embed_model": get_embed_model(config),
+        "top_k": top_k,
+    }
+    cache_path = get_company_dir(slug) / "rag" / FAQ_RETRIEVAL_CACHE
+    try:
+        cached = json.loads(cache_path.read_bytes())
+    except (OSError, ValueError):
+        cached = {}
+    results = cached.get("results", {}) if cached.get("key") == key else {}
+
+    missing = [q for q in questions if q not in results]
+    # 缺失的问题一次批量向量化，而不是每个问题单独请求一次 embed
+    for question, sources in zip(missing, retrieve_many(slug, missing, top_k=top_k, config=config)):
+        results[question] = sources
+    if missing:
+        try:
+            _write_atomic(cache_path, json_dumps_bytes({"key": key, "results": results}, indent=False))
+        except OSError:
+            pass
+    return [results[q] for q in questions]
+
+
 def generate_faq(
     slug: str, name: str, website: str, config: dict, output_path: Path
 ) -> dict:
-    from app.rag import retrieve
-
-    questions = [
-        "你们是做什么的？",
-        "公司能帮助客户什么/解决什么问题？",
-        "主要产品/服务有哪些？",
-        "典型客户/行业？",
-        "典型使用场景/案例？",
-        "如何联系（邮箱/电话/地址/表单）？",
-        "定价/试用（若无写“未提及”）？",
-        "合规/安全（若无写“未提及”）？",
-    ]
+    questions = FAQ_QUESTIONS
 
     base_url = str(config.get("OLLAMA_BASE_URL", "")).rstrip("/")
     model = str(config.get("LLM_MODEL", ""))
+    top_k = int(config.get("TOP_K", 8))
 
-    items = []
-    for idx, question in enumerate(questions, start=1):
-        top_k = int(config.get("TOP_K", 8))
-        sources = retrieve(slug, question, top_k=top_k, config=config)
-        context = "\n".join(f"[{item['idx']}] {item['text']}" for item in sources)
-        prompt = (
-            "请基于资料回答问题，若资料未提及请回答“未提及/不确定”。\n"
-            "答案需要带来源编号，如 [1] 或 [1][3]。\n\n"
-            f"资料:\n{context}\n\n"
-            f"问题: {question}\n"
-        )
+    retrieved = _faq_retrieve(slug, questions, top_k, config)
 
-        payload = {
-            "model": model,
-            "messages": [
-                {
-                    "role": "system",
-                    "content": "你是公司官网资料整理员，要求简洁、结构化，不能编造。",
-                },
-                {"role": "user", "content": prompt},
-            ],
-            "stream": False,
-        }
+    # 默认一次请求生成全部答案；解析失败或缺答案的问题再逐个补问
+    batched: dict[int, tuple[str, list[dict]]] = {}
+    if str(config.get("FAQ_BATCH", "true")).strip().lower() != "false":
+        max_chunks = int(config.get("FAQ_BATCH_MAX_CHUNKS", FAQ_BATCH_MAX_CHUNKS))
+        batched = _faq_answer_batch(base_url, model, questions, retrieved, max_chunks)
 
-        answer_text = "未提及/不确定。"
-        try:
-            response = requests.post(
-                f"{base_url}/api/chat",
-                json=payload,
-                timeout=120,
-            )
-            if response.status_code == 200:
-                data = response.json()
-                answer_text = data.get("message", {}).get("content", "").strip()
-        except requests.RequestException:
-            answer_text = "未提及/不确定。"
+    items = []
+    for idx, (question, sources) in enumerate(zip(questions, retrieved), start=1):
+        if idx - 1 in batched:
+            answer_text, sources = batched[idx - 1]
+        else:
+            answer_text = _faq_answer_single(base_url, model, question, sources)
 
         faq_sources = []
         for src in sources:
@@ -1335,7 +1923,7 @@ def generate_faq(
             {
                 "id": f"faq-{idx:02d}",
                 "question": question,
-                "answer_md": answer_text or "未提及/不确定。",
+                "answer_md": answer_text or FAQ_FALLBACK_ANSWER,
                 "sources": faq_sources,
             }
         )
@@ -1348,7 +1936,7 @@ def generate_faq(
         "items": items,
     }
 
-    output_path.write_text(json.dumps(faq, ensure_ascii=False, indent=2), encoding="utf-8")
+    output_path.write_bytes(json_dumps_bytes(faq))
     return faq
 
 
@@ -1438,6 +2026,16 @@ def parse_args() -> argparse.Namespace:
         default=90000,
         help="Playwright goto 超时毫秒（默认 90000）",
     )
+    parser.add_argument(
+        "--no-http-cache",
+        action="store_true",
+        help="不使用条件请求缓存（ETag/Last-Modified），每次都完整下载",
+    )
+    parser.add_argument(
+        "--keep-raw",
+        action="store_true",
+        help="保留原始 HTML 到 raw/pages/（默认不保存，只写抽取后的正文）",
+    )
     parser.add_argument(
         "--gen-faq",
         type=str,
@@ -1448,7 +2046,10 @@ def parse_args() -> argparse.Namespace:
 
 
 def main() -> None:
+    global HTTP_CACHE_ENABLED
+
     args = parse_args()
+    HTTP_CACHE_ENABLED = not args.no_http_cache
     slug = args.slug.strip()
     if not slug or slug != slug.lower() or " " in slug:
         raise SystemExit("slug 必须是小写且不能包含空格")
@@ -1472,8 +2073,14 @@ def main() -> None:
         js_wait_until=str(args.js_wait_until).strip() or "networkidle",
         js_timeout_ms=int(args.js_timeout_ms),
         allowed_langs=allowed_langs,
+        keep_raw=args.keep_raw,
     )
 
+    # 爬取结束后 URL 缓存不再有用，释放掉再建索引
+    clear_url_caches()
+    if HTTP_CACHE_ENABLED:
+        prune_http_cache()
+
     print("导入完成:")
     print(f"- 抓取页面数: {report['fetched']}")
     print(f"- 抽取成功数(>=min-chars): {report['extracted']}")
@@ -1,5 +1,7 @@
 import json
 import sys
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 from pathlib import Path
 
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
@@ -9,6 +11,8 @@ from app.config import load_config  # noqa: E402
 from scripts.ingest_company import generate_faq  # noqa: E402
 
 COMPANIES_DIR = PROJECT_ROOT / "companies"
+# FAQ 生成主要压在 Ollama 上，并行度不宜过高
+MAX_WORKERS = 2
 
 
 def load_meta(company_dir: Path) -> dict:
@@ -31,6 +35,25 @@ def find_companies() -> list[Path]:
     return sorted(companies, key=lambda p: p.name)
 
 
+def _rebuild_one(company_dir: Path, config: dict) -> str:
+    """Regenerate one company's faq.json in a worker process; returns an error message or ""."""
+    slug = company_dir.name
+    meta = load_meta(company_dir)
+    name = str(meta.get("name", slug)).strip() or slug
+    website = str(meta.get("website", "")).strip()
+    try:
+        generate_faq(
+            slug=slug,
+            name=name,
+            website=website,
+            config=config,
+            output_path=company_dir / "faq.json",
+        )
+    except Exception as exc:
+        return str(exc)
+    return ""
+
+
 def main() -> None:
     companies = find_companies()
     if not companies:
@@ -40,24 +63,14 @@ def main() -> None:
     config = load_config()
     failures = []
 
-    for company_dir in companies:
-        slug = company_dir.name
-        meta = load_meta(company_dir)
-        name = str(meta.get("name", slug)).strip() or slug
-        website = str(meta.get("website", "")).strip()
-        faq_path = company_dir / "faq.json"
-
-        try:
-            generate_faq(
-                slug=slug,
-                name=name,
-                website=website,
-                config=config,
-                output_path=faq_path,
-            )
-            print(f"FAQ 生成完成: {slug}")
-        except Exception as exc:
-            failures.append(f"{slug}: {exc}")
+    workers = max(1, min(MAX_WORKERS, len(companies)))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for company_dir, error in zip(companies, executor.map(_rebuild_one, companies, repeat(config))):
+            slug = company_dir.name
+            if error:
+                failures.append(f"{slug}: {error}")
+            else:
+                print(f"FAQ 生成完成: {slug}")
 
     if failures:
         print("以下公司 FAQ 生成失败:")
@@ -1,9 +1,12 @@
 import sys
-import subprocess
 from pathlib import Path
-import os
 
 ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from app.config import load_config  # noqa: E402
+from app.rag import build_index  # noqa: E402
+
 COMPANIES = ROOT / "companies"
 
 def list_companies():
@@ -19,9 +22,15 @@ def list_companies():
 
     return sorted(companies)
 
-def build(company: str):
+def build(company: str, config: dict):
+    # 进程内直接构建：不再每个公司起一个新解释器重新 import numpy 等依赖
     print(f"==> build_index: {company}", flush=True)
-    subprocess.check_call([sys.executable, "tools/build_index.py", company], cwd=str(ROOT))
+    try:
+        build_index(company, config=config)
+    except Exception as exc:
+        print(f"构建索引失败: {exc}")
+        sys.exit(1)
+    print(f"索引构建完成: {company}")
 
 if __name__ == "__main__":
     args = sys.argv[1:]
@@ -50,9 +59,10 @@ if __name__ == "__main__":
             print("[reindex] 你可以运行：find companies -maxdepth 2 -name sources.md -print")
             sys.exit(1)
 
+        config = load_config()
         for c in comps:
-            build(c)
+            build(c, config)
     elif args:
-        build(args[0])
+        build(args[0], load_config())
     else:
         print("用法：python scripts/reindex.py <company>  或  python scripts/reindex.py --all  或  python scripts/reindex.py --list")
@@ -1,4 +1,7 @@
+import os
 import sys
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 from pathlib import Path
 
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
@@ -8,6 +11,8 @@ from app.config import load_config  # noqa: E402
 from app.rag import build_index  # noqa: E402
 
 COMPANIES_DIR = PROJECT_ROOT / "companies"
+# 各公司互不依赖，按进程并行构建
+MAX_WORKERS = 8
 
 
 def find_companies() -> list[str]:
@@ -20,6 +25,15 @@ def find_companies() -> list[str]:
     return sorted(companies)
 
 
+def _build_one(slug: str, config: dict) -> str:
+    """Build one company's index in a worker process; returns an error message or ""."""
+    try:
+        build_index(slug, config=config)
+    except Exception as exc:
+        return str(exc)
+    return ""
+
+
 def main() -> None:
     companies = find_companies()
     if not companies:
@@ -29,12 +43,13 @@ def main() -> None:
     config = load_config()
     failures: list[str] = []
 
-    for slug in companies:
-        try:
-            build_index(slug, config=config)
-            print(f"索引构建完成: {slug}")
-        except Exception as exc:
-            failures.append(f"{slug}: {exc}")
+    workers = max(1, min(MAX_WORKERS, os.cpu_count() or 1, len(companies)))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for slug, error in zip(companies, executor.map(_build_one, companies, repeat(config))):
+            if error:
+                failures.append(f"{slug}: {error}")
+            else:
+                print(f"索引构建完成: {slug}")
 
     if failures:
         print("以下公司构建失败:")